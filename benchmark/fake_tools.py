@@ -0,0 +1,234 @@
+# fake_tools.py
+#
+# Stand-ins for the external executables used by the pipeline:
+#   colabfold_batch, pymol, Windows-vina and the MGLTools prepare_*4.py scripts.
+# run_benchmarks.py writes small wrapper scripts that call
+#   python fake_tools.py <tool> <args...>
+# and puts them on PATH / MGLTOOLS_HOME. Outputs follow the real file formats
+# closely enough for script.sh and the rest of the pipeline to parse them.
+# FAKE_FOLD_SECONDS / FAKE_DOCK_SECONDS add a fixed delay per call.
+
+import csv
+import json
+import math
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+THREE_LETTER = {
+    "A": "ALA", "R": "ARG", "N": "ASN", "D": "ASP", "C": "CYS", "Q": "GLN", "E": "GLU",
+    "G": "GLY", "H": "HIS", "I": "ILE", "L": "LEU", "K": "LYS", "M": "MET", "F": "PHE",
+    "P": "PRO", "S": "SER", "T": "THR", "W": "TRP", "Y": "TYR", "V": "VAL"
+}
+NUM_MODES = 9
+
+
+def _delay(var):
+    seconds = float(os.environ.get(var, "0"))
+    if seconds:
+        time.sleep(seconds)
+
+def _atom_lines(path):
+    with open(path, "r") as f:
+        return [line.rstrip("\n") for line in f if line.startswith(("ATOM", "HETATM"))]
+
+def _coords(lines):
+    return [(float(l[30:38]), float(l[38:46]), float(l[46:54])) for l in lines]
+
+def _pdb_atom(record, serial, name, resname, chain, resseq, x, y, z, element):
+    return (f"{record:<6}{serial:>5} {name:<4} {resname:>3} {chain}{resseq:>4}    "
+            f"{x:8.3f}{y:8.3f}{z:8.3f}  1.00 90.00          {element:>2}")
+
+
+# --- colabfold_batch ---
+
+def helix_pdb(sequence):
+    """Builds a backbone-only alpha helix for a sequence, in AlphaFold PDB layout."""
+    lines = []
+    serial = 1
+    for i, aa in enumerate(sequence):
+        angle = math.radians(100 * i)
+        for name, radius, rise, element in (("N", 1.55, -0.5, "N"), ("CA", 2.3, 0.0, "C"),
+                                            ("C", 1.6, 0.6, "C"), ("O", 1.9, 1.2, "O")):
+            x, y, z = radius * math.cos(angle), radius * math.sin(angle), 1.5 * i + rise
+            lines.append(_pdb_atom("ATOM", serial, name, THREE_LETTER.get(aa, "UNK"), "A", i + 1, x, y, z, element))
+            serial += 1
+    lines.append("END")
+    return "\n".join(lines) + "\n"
+
+def colabfold_batch(args):
+    positional = [a for a in args if not a.startswith("--")]
+    # options that take a value
+    for opt in ("--msa-mode", "--num-models", "--num-recycle", "--custom-template-path"):
+        if opt in args:
+            positional.remove(args[args.index(opt) + 1])
+    query, out_dir = Path(positional[0]), Path(positional[1])
+    num_models = int(args[args.index("--num-models") + 1]) if "--num-models" in args else 5
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if query.suffix == ".csv":
+        with open(query, newline="") as f:
+            jobs = [(row["id"], row["sequence"]) for row in csv.DictReader(f)]
+    else:
+        text = query.read_text().splitlines()
+        jobs = [(text[0][1:].split("|")[0], "".join(text[1:]).strip())]
+
+    print("Running colabfold 1.5.5 (fake)")
+    for job_id, sequence in jobs:
+        for model in range(1, num_models + 1):
+            _delay("FAKE_FOLD_SECONDS")
+            name = f"{job_id}_unrelaxed_rank_{model:03d}_alphafold2_ptm_model_{model}_seed_000"
+            (out_dir / f"{name}.pdb").write_text(helix_pdb(sequence))
+            plddt = [round(random.uniform(60, 95), 2) for _ in sequence]
+            (out_dir / f"{job_id}_scores_rank_{model:03d}_alphafold2_ptm_model_{model}_seed_000.json").write_text(
+                json.dumps({"plddt": plddt, "ptm": round(random.uniform(0.5, 0.9), 2)}))
+            print(f"{job_id} rank_{model:03d}_alphafold2_ptm_model_{model}_seed_000 pLDDT={sum(plddt)/len(plddt):.3g}")
+    (out_dir / f"{jobs[0][0]}.done.txt").write_text("")
+    print("Done")
+
+
+# --- pymol ---
+
+def sdf_to_pdb(sdf_path):
+    lines = open(sdf_path).read().splitlines()
+    num_atoms = int(lines[3][:3])
+    atoms = []
+    for i, line in enumerate(lines[4:4 + num_atoms]):
+        x, y, z, element = float(line[0:10]), float(line[10:20]), float(line[20:30]), line[31:34].strip()
+        atoms.append(_pdb_atom("HETATM", i + 1, f"{element}{i + 1}"[:4], "UNL", " ", 1, x, y, z, element))
+    return atoms
+
+def cif_to_pdb(cif_path, pdb_path):
+    # PyMOL parses by extension: PDB content in a .cif file does not load
+    from Bio.PDB import MMCIFParser, PDBIO
+    if not Path(cif_path).read_text(errors="replace").lstrip().startswith("data_"):
+        raise SystemExit(f"fake pymol: {cif_path} is not mmCIF")
+    io = PDBIO()
+    io.set_structure(MMCIFParser(QUIET=True).get_structure("receptor", cif_path))
+    io.save(pdb_path)
+
+def pymol(args):
+    script = Path(args[[a.endswith(".py") for a in args].index(True)]).name
+    ligand_file, receptor_file = args[args.index("--") + 1:args.index("--") + 3]
+
+    if script == "turn_file_into_pdb.py":
+        ligand = sdf_to_pdb(ligand_file) if ligand_file.endswith(".sdf") else _atom_lines(ligand_file)
+        Path("ligand.pdb").write_text("\n".join(ligand + ["END"]) + "\n")
+        if receptor_file.endswith(".cif"):
+            cif_to_pdb(receptor_file, "receptor.pdb")
+        else:
+            Path("receptor.pdb").write_text("\n".join(_atom_lines(receptor_file) + ["END"]) + "\n")
+
+    elif script == "get_gridbox.py":
+        # selection "ligand around 10": box around the ligand padded by 10 A
+        coords = _coords(_atom_lines(ligand_file))
+        low = [min(c[i] for c in coords) - 10 for i in range(3)]
+        high = [max(c[i] for c in coords) + 10 for i in range(3)]
+        center = [(low[i] + high[i]) / 2 for i in range(3)]
+        size = [high[i] - low[i] for i in range(3)]
+        with open("conf.txt", "w") as f:
+            f.write(f"receptor = {receptor_file}\n")
+            f.write(f"ligand = {ligand_file}\n")
+            for axis, value in zip("xyz", center):
+                f.write(f"center_{axis} = {value:.3f}\n")
+            for axis, value in zip("xyz", size):
+                f.write(f"size_{axis} = {value:.3f}\n")
+            f.write("out = vina_out.pdbqt\n")
+            f.write("log = vina_log.txt\n")
+            f.write("exhaustiveness = 16\n")
+        print(f"\n✅ Config file 'conf.txt' generated!")
+    else:
+        raise SystemExit(f"fake pymol: unsupported script {script}")
+
+
+# --- MGLTools prepare_receptor4.py / prepare_ligand4.py ---
+
+def mgltools(args):
+    script = Path(args[0]).name
+    flag = "-r" if script == "prepare_receptor4.py" else "-l"
+    src, dst = args[args.index(flag) + 1], args[args.index("-o") + 1]
+    with open(dst, "w") as f:
+        for line in _atom_lines(src):
+            element = line[76:78].strip() or line[12:14].strip()[0]
+            f.write(f"{line[:66]:<66}    +0.000 {element:<2}\n")
+        f.write("TER\n")
+
+
+# --- Windows-vina ---
+
+def vina(args):
+    config = {}
+    with open(args[args.index("--config") + 1]) as f:
+        for line in f:
+            if "=" in line:
+                key, value = line.split("=", 1)
+                config[key.strip()] = value.strip()
+
+    seed = random.randint(-2**31, 2**31 - 1)
+    rng = random.Random(seed)
+    _delay("FAKE_DOCK_SECONDS")
+
+    ligand = _atom_lines(config["ligand"])
+    center = [float(config[f"center_{axis}"]) for axis in "xyz"]
+    ligand_center = [sum(c[i] for c in _coords(ligand)) / len(ligand) for i in range(3)]
+
+    affinities = sorted(round(rng.uniform(-8.5, -4.0), 1) for _ in range(NUM_MODES))
+    rmsds = [(0.0, 0.0)] + sorted((round(lb, 3), round(lb + rng.uniform(0.5, 3), 3))
+                                  for lb in (rng.uniform(0.5, 8) for _ in range(NUM_MODES - 1)))
+
+    with open(config.get("out", "vina_out.pdbqt"), "w") as f:
+        for mode, (affinity, (lb, ub)) in enumerate(zip(affinities, rmsds), start=1):
+            shift = [center[i] - ligand_center[i] + rng.uniform(-3, 3) for i in range(3)]
+            f.write(f"MODEL {mode}\n")
+            f.write(f"REMARK VINA RESULT: {affinity:9.1f}{lb:11.3f}{ub:11.3f}\n")
+            for line in ligand:
+                x, y, z = (float(line[30:38]) + shift[0], float(line[38:46]) + shift[1],
+                           float(line[46:54]) + shift[2])
+                f.write(f"{line[:30]}{x:8.3f}{y:8.3f}{z:8.3f}{line[54:]}\n")
+            f.write("ENDMDL\n")
+
+    print("#################################################################")
+    print("# If you used AutoDock Vina in your work, please cite:          #")
+    print("#                                                               #")
+    print("# O. Trott, A. J. Olson,                                        #")
+    print("# AutoDock Vina: improving the speed and accuracy of docking    #")
+    print("# with a new scoring function, efficient optimization and       #")
+    print("# multithreading, Journal of Computational Chemistry 31 (2010)  #")
+    print("# 455-461                                                       #")
+    print("#                                                               #")
+    print("# DOI 10.1002/jcc.21334                                         #")
+    print("#                                                               #")
+    print("# Please see http://vina.scripps.edu for more information.      #")
+    print("#################################################################")
+    print("")
+    print("Detected 8 CPUs")
+    print("Reading input ... done.")
+    print("Setting up the scoring function ... done.")
+    print("Analyzing the binding site ... done.")
+    print(f"Using random seed: {seed}")
+    print("Performing search ... ")
+    print("0%   10   20   30   40   50   60   70   80   90   100%")
+    print("|----|----|----|----|----|----|----|----|----|----|")
+    print("***************************************************")
+    print("done.")
+    print("Refining results ... done.")
+    print("")
+    print("mode |   affinity | dist from best mode")
+    print("     | (kcal/mol) | rmsd l.b.| rmsd u.b.")
+    print("-----+------------+----------+----------")
+    for mode, (affinity, (lb, ub)) in enumerate(zip(affinities, rmsds), start=1):
+        print(f"{mode:4d}{affinity:12.1f}{lb:12.3f}{ub:11.3f}")
+    print("Writing output ... done.")
+
+
+TOOLS = {
+    "colabfold_batch": colabfold_batch,
+    "pymol": pymol,
+    "mgltools": mgltools,
+    "vina": vina,
+}
+
+if __name__ == "__main__":
+    TOOLS[sys.argv[1]](sys.argv[2:])
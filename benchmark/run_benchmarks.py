@@ -0,0 +1,379 @@
+# run_benchmarks.py
+#
+# Offline end-to-end benchmark for receptor.py, getLigand.py, blast.py,
+# diversity.py, pose_analysis.py and the dockingFolder pipeline. External services are replaced
+# by stub_services.py, ZymCTRL by stubs/transformers and colabfold_batch /
+# pymol / MGLTools / Vina by fake_tools.py, so nothing touches the network.
+#
+# Usage:
+#   python benchmark/run_benchmarks.py                       # default counts
+#   python benchmark/run_benchmarks.py --counts 10 100 1000 --label my-change
+#   python benchmark/run_benchmarks.py --compare results/A.json results/B.json
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+BENCH_ROOT = Path(__file__).resolve().parent
+APP_ROOT = BENCH_ROOT.parent
+RESULTS_DIR = BENCH_ROOT / "results"
+STUBS_DIR = BENCH_ROOT / "stubs"
+FAKE_TOOLS = BENCH_ROOT / "fake_tools.py"
+RUSAGE_EXEC = BENCH_ROOT / "rusage_exec.py"
+
+sys.path.insert(0, str(APP_ROOT))
+sys.path.insert(0, str(STUBS_DIR))
+sys.path.insert(0, str(BENCH_ROOT))
+
+from stub_services import start_stub_server
+
+DEFAULT_COUNTS = [10, 100, 1000]
+LIGAND = "GlcNAc"
+RECEPTOR_KEY = "PGA"
+
+
+def print_step(message):
+    """Prints a formatted step message to the console."""
+    print("\n" + "="*60)
+    print(f"STEP: {message}")
+    print("="*60)
+
+
+# --- Measurement Helpers ---
+
+def measure(records, stage, n, fn, *args, **kwargs):
+    """Runs fn in-process and records wall time and peak Python heap."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    records.append(_record(stage, n, seconds, peak / 2**20, "tracemalloc"))
+    return result
+
+def measure_subprocess(records, stage, n, cmd, cwd, env, log_path):
+    """Runs cmd as a child process and records wall time and peak RSS of the process tree."""
+    usage_path = Path(log_path).with_suffix(".rusage.json")
+    start = time.perf_counter()
+    with open(log_path, "a") as log:
+        subprocess.run([sys.executable, str(RUSAGE_EXEC), str(usage_path)] + cmd,
+                       cwd=str(cwd), env=env, stdout=log, stderr=subprocess.STDOUT)
+    seconds = time.perf_counter() - start
+    with open(usage_path) as f:
+        usage = json.load(f)
+    if usage["exit_code"] != 0:
+        raise RuntimeError(f"{stage} failed with exit code {usage['exit_code']}, see {log_path}")
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak_mb = usage["ru_maxrss"] / (2**20 if sys.platform == "darwin" else 2**10)
+    records.append(_record(stage, n, seconds, peak_mb, "rusage"))
+
+def _record(stage, n, seconds, peak_mb, memory_source):
+    return {
+        "stage": stage,
+        "n": n,
+        "seconds": round(seconds, 6),
+        "items_per_second": round(n / seconds, 3) if seconds > 0 else None,
+        "peak_mb": round(peak_mb, 3),
+        "memory_source": memory_source,
+    }
+
+
+# --- Workspace With Fake Executables ---
+
+def _write_wrapper(path, tool):
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_TOOLS}" {tool} "$@"\n')
+    path.chmod(0o755)
+
+def make_workspace(root, service_env):
+    """
+    Creates a scratch copy of the pipeline layout (static/, enzyme_ligand_structures/,
+    dockingFolder/) plus fake executables, and returns the environment to run it with.
+    """
+    bin_dir = root / "bin"
+    mgl_dir = root / "mgltools"
+    bin_dir.mkdir()
+    mgl_dir.mkdir()
+    _write_wrapper(bin_dir / "colabfold_batch", "colabfold_batch")
+    _write_wrapper(bin_dir / "pymol", "pymol")
+    _write_wrapper(bin_dir / "Windows-vina", "vina")
+    _write_wrapper(mgl_dir / "python.exe", "mgltools")
+
+    (root / "static").mkdir()
+    shutil.copytree(APP_ROOT / "enzyme_ligand_structures", root / "enzyme_ligand_structures")
+    shutil.copytree(APP_ROOT / "dockingFolder", root / "dockingFolder")
+
+    env = dict(os.environ)
+    env.update(service_env)
+    env["PATH"] = f"{bin_dir}{os.pathsep}{env.get('PATH', '')}"
+    env["PYTHONPATH"] = os.pathsep.join([str(STUBS_DIR), str(APP_ROOT), env.get("PYTHONPATH", "")])
+    env["MGLTOOLS_HOME"] = str(mgl_dir)
+    env["ENDZYME_ROOT"] = str(APP_ROOT)   # script.sh finds results_db.py here
+    return env
+
+
+# --- Benchmarks ---
+
+def bench_receptor_stages(records, counts, workspace):
+    """Times each receptor.py orchestrator stage in-process."""
+    previous_cwd = os.getcwd()
+    try:
+        for n in counts:
+            run_dir = workspace / f"receptor_{n}"
+            run_dir.mkdir()
+            os.chdir(run_dir)
+            sys.argv = ["receptor.py", f"BENCH{n}", str(n), ""]
+            receptor = importlib.reload(sys.modules["receptor"]) if "receptor" in sys.modules \
+                else importlib.import_module("receptor")
+            os.makedirs(receptor.OUTPUT_DIR)
+
+            protein_name = measure(records, "receptor.find_enzyme", 1, receptor.find_enzyme_for_ligand, "PGA")
+            uniprot_id, template = measure(records, "receptor.uniprot", 1, receptor.get_uniprot_data_by_name, protein_name)
+            measure(records, "receptor.alphafold_download", 1, receptor.download_alphafold_pdb, uniprot_id)
+            candidates = measure(records, "receptor.generate", n,
+                                 receptor.generate_novel_sequences_with_zymctrl, template, None, num_to_generate=n)
+            candidates, clusters = measure(records, "receptor.diversity", n, receptor.select_representatives,
+                                           [receptor.clean_sequence(seq) for seq in candidates])
+            measure(records, "receptor.save_files", len(candidates),
+                    receptor.save_files_for_manual_analysis, template, candidates, uniprot_id)
+            measure(records, "receptor.candidates_js", len(candidates), receptor.turn_candidates_to_js_files)
+    finally:
+        os.chdir(previous_cwd)
+
+def bench_get_ligand_stages(records, workspace):
+    """Times each getLigand.py stage in-process."""
+    previous_cwd = os.getcwd()
+    try:
+        run_dir = workspace / "get_ligand"
+        run_dir.mkdir()
+        os.chdir(run_dir)
+        get_ligand = importlib.import_module("getLigand")
+        get_ligand.setup_environment()
+        protein_name = measure(records, "getLigand.kegg", 1, get_ligand.find_enzyme_via_kegg, LIGAND)
+        measure(records, "getLigand.enzyme_structure", 1,
+                get_ligand.get_and_save_enzyme_structure, protein_name, get_ligand.OUTPUT_DIR)
+        measure(records, "getLigand.ligand_structure", 1,
+                get_ligand.get_and_save_ligand_structure, LIGAND, get_ligand.OUTPUT_DIR)
+    finally:
+        os.chdir(previous_cwd)
+
+def bench_alignment(records, counts):
+    """Times blast.align_sequences of n generated candidates against the template."""
+    from blast import align_sequences
+    from stub_services import StubHandler
+    generator = importlib.import_module("transformers").pipeline("text-generation")
+    template = StubHandler.sequence
+
+    def align_all(sequences):
+        for seq in sequences:
+            align_sequences(template, seq)
+
+    for n in counts:
+        outputs = generator("<|endoftext|>", max_length=len(template), num_return_sequences=n)
+        sequences = [o["generated_text"].replace("<|endoftext|>", "") for o in outputs]
+        measure(records, "blast.align_sequences", n, align_all, sequences)
+
+def bench_pose_analysis(records, counts):
+    """Times pose_analysis.rank_poses of 9 Vina modes per candidate against the template structure."""
+    import numpy as np
+    import pose_analysis
+    receptor = pose_analysis.load_receptor(APP_ROOT / "static" / "PGA__pdb_files" / "Q6GYA5_alphafold.cif")
+    rng = np.random.default_rng(0)
+    atoms = 15    # heavy atoms of GlcNAc
+
+    for n in counts:
+        poses = []
+        for mode in range(n * 9):
+            center = receptor["coords"][rng.integers(len(receptor["coords"]))]
+            coords = center + rng.normal(scale=2.0, size=(atoms, 3))
+            polar = rng.random(atoms) < 0.4
+            poses.append((mode % 9 + 1, -9.0 + rng.random() * 4, coords, polar, ~polar))
+        measure(records, "pose_analysis.rank_poses", n, pose_analysis.rank_poses, receptor, poses, ["D197", "E198"])
+
+def bench_end_to_end(records, counts, workspace, env, subprocess_limit):
+    """Times receptor.py, getLigand.py, colabfold_batch and script.sh as child processes."""
+    log_path = workspace / "subprocess.log"
+
+    for n in counts:
+        measure_subprocess(records, "receptor.py", n,
+                           [sys.executable, str(APP_ROOT / "receptor.py"), f"E2E{n}", str(n), ""],
+                           workspace, env, log_path)
+
+    measure_subprocess(records, "getLigand.py", 1,
+                       [sys.executable, str(APP_ROOT / "getLigand.py"), LIGAND], workspace, env, log_path)
+
+    # colabfold_batch is launched the same way as main._build_colab_cmd builds it
+    template_pdb = (APP_ROOT / "static" / "PGA__pdb_files" / "Q6GYA5_alphafold.cif").read_text()
+    from stub_services import sequence_from_pdb
+    template = sequence_from_pdb(template_pdb)
+    for n in counts:
+        n_fold = min(n, subprocess_limit)
+        job_dir = workspace / f"af2_{n_fold}"
+        job_dir.mkdir(exist_ok=True)
+        csv_path = job_dir / "batch.csv"
+        csv_path.write_text("id,sequence\n" + "".join(f"candidate_{i + 1},{template}\n" for i in range(n_fold)))
+        measure_subprocess(records, "colabfold_batch", n_fold,
+                           ["colabfold_batch", "--msa-mode", "single_sequence", str(csv_path), str(job_dir),
+                            "--num-models", "1"],
+                           job_dir, env, log_path)
+
+    # script.sh docks one receptor per call
+    docking_dir = workspace / "dockingFolder"
+    receptor_dir = workspace / "static" / f"{RECEPTOR_KEY}_pdb_files"
+    receptor_dir.mkdir(parents=True, exist_ok=True)
+    # script.sh loads <receptor>.cif in PyMOL, which needs real mmCIF
+    from pipeline_engine import save_as_mmcif
+    save_as_mmcif(APP_ROOT / "static" / "PGA__pdb_files" / "Q6GYA5_alphafold.cif", receptor_dir / f"{RECEPTOR_KEY}.cif")
+    for n in counts:
+        n_dock = min(n, subprocess_limit)
+        # results/ is cleared each time, otherwise script.sh skips seeds it already ran
+        measure_subprocess(records, "script.sh", n_dock,
+                           ["bash", "-c", f"for i in $(seq {n_dock}); do rm -rf results; "
+                                          f"bash script.sh {LIGAND} {RECEPTOR_KEY} || exit 1; done"],
+                           docking_dir, env, log_path)
+
+
+def bench_pipeline(records, counts, workspace, env, subprocess_limit):
+    """Times a streaming generate -> screen -> fold -> dock campaign (pipeline_engine.py)."""
+    from pipeline_engine import build_design_pipeline
+
+    saved = {k: os.environ.get(k) for k in ("PATH", "MGLTOOLS_HOME", "FAKE_FAMILIES")}
+    os.environ.update({"PATH": env["PATH"], "MGLTOOLS_HOME": env["MGLTOOLS_HOME"]})
+    # unique samples, so the screen stage passes every candidate on to fold and dock
+    os.environ["FAKE_FAMILIES"] = "0"
+    try:
+        for n in counts:
+            n_run = min(n, subprocess_limit)
+            run_dir = workspace / f"pipeline_{n_run}"
+            build_fold_cmd = lambda csv_path, job_dir: ["colabfold_batch", "--msa-mode", "single_sequence",
+                                                        str(csv_path), str(job_dir), "--num-models", "1"]
+            run = build_design_pipeline("PGA", LIGAND, n_run, run_dir, build_fold_cmd,
+                                        workers={"fold": 2, "dock": 2})
+            measure(records, "pipeline_engine", n_run, lambda: run.start().wait())
+            if run.state != "finished":
+                raise RuntimeError(f"pipeline benchmark failed: {run.error}")
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+# --- Results ---
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(APP_ROOT),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def save_results(records, counts, label):
+    RESULTS_DIR.mkdir(exist_ok=True)
+    stamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    path = RESULTS_DIR / (f"{stamp}_{label}.json" if label else f"{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "timestamp": stamp,
+            "label": label,
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "counts": counts,
+            "records": records,
+        }, f, indent=2)
+    print(f"✅ Saved results to: {path}")
+    return path
+
+def print_table(records):
+    print(f"{'stage':<30}{'n':>7}{'seconds':>12}{'items/s':>12}{'peak MB':>10}")
+    for r in records:
+        rate = f"{r['items_per_second']:.1f}" if r["items_per_second"] else "-"
+        print(f"{r['stage']:<30}{r['n']:>7}{r['seconds']:>12.4f}{rate:>12}{r['peak_mb']:>10.1f}")
+
+def compare_results(base_path, new_path):
+    """Prints per-stage time and memory ratios between two result files (new / base)."""
+    with open(base_path) as f:
+        base = {(r["stage"], r["n"]): r for r in json.load(f)["records"]}
+    with open(new_path) as f:
+        new = {(r["stage"], r["n"]): r for r in json.load(f)["records"]}
+
+    print(f"{'stage':<30}{'n':>7}{'base s':>10}{'new s':>10}{'time x':>9}{'mem x':>8}")
+    for key in sorted(base.keys() & new.keys()):
+        b, c = base[key], new[key]
+        time_ratio = c["seconds"] / b["seconds"] if b["seconds"] else float("nan")
+        mem_ratio = c["peak_mb"] / b["peak_mb"] if b["peak_mb"] else float("nan")
+        print(f"{key[0]:<30}{key[1]:>7}{b['seconds']:>10.4f}{c['seconds']:>10.4f}{time_ratio:>9.2f}{mem_ratio:>8.2f}")
+    for key in sorted(base.keys() ^ new.keys()):
+        print(f"{key[0]:<30}{key[1]:>7}  only in {'base' if key in base else 'new'}")
+
+
+# --- Main Orchestrator ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline ENDzyme pipeline benchmark")
+    parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS,
+                        help="candidate counts to benchmark")
+    parser.add_argument("--subprocess-limit", type=int, default=20,
+                        help="max candidates folded/docked per count in the end-to-end stages")
+    parser.add_argument("--skip-end-to-end", action="store_true",
+                        help="only run the in-process stage benchmarks")
+    parser.add_argument("--label", default="", help="suffix for the results file name")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="compare two saved result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    server, service_env = start_stub_server()
+    os.environ.update(service_env)
+    records = []
+    workspace = Path(tempfile.mkdtemp(prefix="endzyme_bench_"))
+    os.environ["ENDZYME_RESULTS_DB"] = str(workspace / "results.sqlite")
+    try:
+        env = make_workspace(workspace, service_env)
+
+        print_step("receptor.py stages")
+        bench_receptor_stages(records, args.counts, workspace)
+
+        print_step("getLigand.py stages")
+        bench_get_ligand_stages(records, workspace)
+
+        print_step("blast.py alignment")
+        bench_alignment(records, args.counts)
+
+        print_step("pose_analysis.py re-ranking")
+        bench_pose_analysis(records, args.counts)
+
+        if not args.skip_end_to_end:
+            print_step("End-to-end subprocesses (receptor.py, getLigand.py, colabfold_batch, script.sh)")
+            bench_end_to_end(records, args.counts, workspace, env, args.subprocess_limit)
+
+            print_step("Streaming pipeline (pipeline_engine.py)")
+            bench_pipeline(records, args.counts, workspace, env, args.subprocess_limit)
+    finally:
+        server.shutdown()
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    print_table(records)
+    save_results(records, args.counts, args.label)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+# rusage_exec.py
+#
+# Runs a command and writes its exit code and peak RSS to a JSON file:
+#   python rusage_exec.py <out.json> <cmd> [args...]
+# Linux carries a parent's peak RSS into forked children, so the benchmark
+# launches measured commands through this small process instead of directly.
+
+import json
+import os
+import subprocess
+import sys
+
+if __name__ == "__main__":
+    out_path, cmd = sys.argv[1], sys.argv[2:]
+    proc = subprocess.Popen(cmd)
+    _, status, usage = os.wait4(proc.pid, 0)
+    exit_code = os.waitstatus_to_exitcode(status)
+    with open(out_path, "w") as f:
+        json.dump({"exit_code": exit_code, "ru_maxrss": usage.ru_maxrss}, f)
+    sys.exit(exit_code)
@@ -0,0 +1,128 @@
+# stub_services.py
+#
+# Local HTTP stand-in for UniProt, AlphaFold DB, PubChem and KEGG.
+# Only the endpoints used by receptor.py and getLigand.py are implemented,
+# with response shapes copied from the real services.
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, unquote
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+TEMPLATE_PDB = APP_ROOT / "static" / "PGA__pdb_files" / "Q6GYA5_alphafold.cif"
+TEMPLATE_SDF = APP_ROOT / "enzyme_ligand_structures" / "GlcNAc_ligand.sdf"
+TEMPLATE_ID = "Q6GYA5"
+TEMPLATE_CID = 439174
+
+THREE_TO_ONE = {
+    "ALA": "A", "ARG": "R", "ASN": "N", "ASP": "D", "CYS": "C", "GLN": "Q", "GLU": "E",
+    "GLY": "G", "HIS": "H", "ILE": "I", "LEU": "L", "LYS": "K", "MET": "M", "PHE": "F",
+    "PRO": "P", "SER": "S", "THR": "T", "TRP": "W", "TYR": "Y", "VAL": "V"
+}
+
+
+def sequence_from_pdb(pdb_text):
+    """Reads the one-letter sequence from the CA atoms of a PDB file."""
+    residues = []
+    for line in pdb_text.splitlines():
+        if line.startswith("ATOM") and line[12:16].strip() == "CA":
+            residues.append(THREE_TO_ONE.get(line[17:20], "X"))
+    return "".join(residues)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    pdb_text = ""
+    sdf_text = ""
+    sequence = ""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, content_type="text/plain", status=200):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json(self, obj):
+        self._send(json.dumps(obj), "application/json")
+
+    def do_GET(self):
+        path = unquote(urlparse(self.path).path)
+        base = f"http://{self.headers['Host']}"
+
+        # --- UniProt ---
+        if path == "/uniprotkb/search":
+            self._json({"results": [{
+                "primaryAccession": TEMPLATE_ID,
+                "proteinName": {"fullName": {"value": "Beta-N-acetylhexosaminidase"}},
+                "sequence": {"value": self.sequence, "length": len(self.sequence)}
+            }]})
+
+        # --- AlphaFold DB ---
+        elif path.startswith("/api/prediction/"):
+            uniprot_id = path.rsplit("/", 1)[-1]
+            self._json([{
+                "entryId": f"AF-{uniprot_id}-F1",
+                "uniprotAccession": uniprot_id,
+                "pdbUrl": f"{base}/files/AF-{uniprot_id}-F1-model_v4.pdb"
+            }])
+        elif path.startswith("/files/"):
+            self._send(self.pdb_text)
+
+        # --- PubChem ---
+        elif path.startswith("/rest/pug/compound/name/"):
+            self._json({"IdentifierList": {"CID": [TEMPLATE_CID]}})
+        elif path.startswith("/rest/pug/compound/cid/"):
+            self._send(self.sdf_text)
+
+        # --- KEGG ---
+        elif path.startswith("/find/compound/"):
+            self._send("cpd:C00140\tN-Acetyl-D-glucosamine; GlcNAc\n")
+        elif path.startswith("/link/reaction/"):
+            self._send("cpd:C00140\trn:R00022\n")
+        elif path.startswith("/link/enzyme/"):
+            self._send("rn:R00022\tec:3.2.1.52\n")
+        elif path.startswith("/get/"):
+            self._send("ENTRY       EC 3.2.1.52                 Enzyme\n"
+                       "NAME        beta-N-acetylhexosaminidase;\n"
+                       "            hexosaminidase\n///\n")
+        else:
+            self._send("Not found", status=404)
+
+
+def start_stub_server(port=0):
+    """
+    Starts the stub server on a background thread.
+    Returns (server, env) where env maps the endpoint variables read by
+    receptor.py / getLigand.py to the local server.
+    """
+    StubHandler.pdb_text = TEMPLATE_PDB.read_text()
+    StubHandler.sdf_text = TEMPLATE_SDF.read_text()
+    StubHandler.sequence = sequence_from_pdb(StubHandler.pdb_text)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    env = {
+        "UNIPROT_SEARCH_URL": f"{base}/uniprotkb/search",
+        "ALPHA_FOLD_API_URL": f"{base}/api/prediction",
+        "PUBCHEM_API_URL": f"{base}/rest/pug",
+        "KEGG_REST_URL": base,
+    }
+    return server, env
+
+
+if __name__ == "__main__":
+    server, env = start_stub_server(port=8765)
+    for key, value in env.items():
+        print(f"export {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,50 @@
+# Tiny stand-in for the `transformers` text-generation pipeline.
+#
+# Put benchmark/stubs on PYTHONPATH to use it instead of ZymCTRL. Every sample
+# is one of FAKE_FAMILIES (default 4) random template sequences with ~5% of
+# its residues mutated, so diversity.py has near-duplicates to cluster.
+# FAKE_FAMILIES=0 makes every sample a fresh random sequence instead.
+# FAKE_TOKEN_SECONDS adds a per-token delay to mimic model speed.
+
+import os
+import random
+import time
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+EOS = "<|endoftext|>"
+
+
+class _TextGenerationPipeline:
+    def __init__(self, model, seed=0):
+        self.model = model
+        self.rng = random.Random(seed)
+        self.token_seconds = float(os.environ.get("FAKE_TOKEN_SECONDS", "0"))
+        self.families = int(os.environ.get("FAKE_FAMILIES", "4"))
+        self._templates = []
+
+    def _template(self, length):
+        if self.families > 0:
+            if not self._templates:
+                self._templates = ["".join(self.rng.choice(AMINO_ACIDS) for _ in range(length))
+                                   for _ in range(self.families)]
+            return self.rng.choice(self._templates)
+        return "".join(self.rng.choice(AMINO_ACIDS) for _ in range(length))
+
+    def __call__(self, prompt, max_length=400, num_return_sequences=1, max_new_tokens=None, **kwargs):
+        if max_new_tokens is not None:
+            max_length = max(1, max_new_tokens - 1)   # receptor.py asks for residues + EOS
+        outputs = []
+        for _ in range(num_return_sequences):
+            seq = list(self._template(max_length))
+            for _ in range(max(1, max_length // 20)):
+                seq[self.rng.randrange(len(seq))] = self.rng.choice(AMINO_ACIDS)
+            if self.token_seconds:
+                time.sleep(self.token_seconds * max_length)
+            outputs.append({"generated_text": prompt + "".join(seq) + EOS})
+        return outputs
+
+
+def pipeline(task, model=None, **kwargs):
+    if task != "text-generation":
+        raise ValueError(f"Stub pipeline only supports 'text-generation', got '{task}'")
+    return _TextGenerationPipeline(model)
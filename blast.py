@@ -12,4 +12,39 @@ def align_sequences(seq1, seq2, mode="global"):
         "score": top_alignment.score,
         "alignment": str(top_alignment),
         "mode": mode
-    }
\ No newline at end of file
+    }
+
+def sequence_identity(seq1, seq2, mode="global"):
+    """
+    Fraction of identical residues in the top alignment of seq1 and seq2,
+    relative to the longer sequence, so a fragment is not identical to the
+    full-length sequence it was cut from. Uses the same scoring as
+    align_sequences.
+    """
+    if not seq1 or not seq2:
+        return 0.0
+    aligner = PairwiseAligner(match_score = 1.0,open_gap_score = -1.0, mismatch_score = -1.0)
+    aligner.mode = mode
+
+    top_alignment = aligner.align(seq1, seq2)[0]
+    matches = 0
+    for (s1, e1), (s2, e2) in zip(*top_alignment.aligned):
+        matches += sum(1 for a, b in zip(seq1[s1:e1], seq2[s2:e2]) if a == b)
+
+    return matches / max(len(seq1), len(seq2))
+
+def map_residue_numbers(seq1, seq2, positions, mode="global"):
+    """
+    Maps 1-based residue numbers of seq1 onto seq2 through the top alignment.
+    Returns {position: position in seq2}; positions in a gap are left out.
+    """
+    aligner = PairwiseAligner(match_score = 1.0,open_gap_score = -1.0, mismatch_score = -1.0)
+    aligner.mode = mode
+
+    top_alignment = aligner.align(seq1, seq2)[0]
+    mapped = {}
+    for (s1, e1), (s2, e2) in zip(*top_alignment.aligned):
+        for position in positions:
+            if s1 < position <= e1:
+                mapped[position] = int(s2 + (position - s1))
+    return mapped
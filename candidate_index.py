@@ -0,0 +1,230 @@
+# candidate_index.py
+#
+# Paginated listing of generated candidates for /api/candidates. The
+# candidates live in the results database (results_db.py: run_candidates,
+# candidates, mutations), which receptor.py and pipeline_engine.py write as
+# they save files, so the API never has to re-read static/<ligand>_pdb_files
+# and there is one store for candidates, docking and pose data. Folders
+# written before that can be imported once with:
+#   python candidate_index.py <ligand> [<ligand> ...]
+
+import base64
+import json
+import sys
+from pathlib import Path
+
+import results_db
+
+APP_ROOT = Path(__file__).resolve().parent
+STATIC_ROOT = APP_ROOT / "static"
+
+SORT_FIELDS = ("mutation_count", "length", "identity", "affinity", "id")
+# field: SQL expression over run_candidates rc / candidates c / candidate_affinities a
+FIELD_SQL = {
+    "id": "rc.rowid",
+    "run_id": "rc.run_id",
+    "ligand": "rc.ligand",
+    "name": "rc.name",
+    "filename": "rc.filename",
+    "length": "rc.length",
+    "mutation_count": "rc.mutation_count",
+    "identity": "rc.identity",
+    "affinity": "a.affinity",        # best affinity against dock_ligand
+    "sequence": "c.sequence",
+    "mutations": "CASE WHEN rc.mutation_count IS NULL THEN NULL ELSE "
+                 "(SELECT json_group_array(mutation) FROM (SELECT mutation FROM mutations m "
+                 "WHERE m.seq_hash = rc.seq_hash AND m.template = rc.template ORDER BY m.rowid)) END",
+    "seq_hash": "rc.seq_hash",
+    "created_at": "rc.created_at",
+}
+FIELDS = tuple(FIELD_SQL)
+DEFAULT_FIELDS = ("id", "run_id", "ligand", "name", "length", "mutation_count", "identity", "affinity")
+FILTERS = {
+    # query parameter: (field, operator)
+    "min_mutations": ("mutation_count", ">="),
+    "max_mutations": ("mutation_count", "<="),
+    "min_length": ("length", ">="),
+    "max_length": ("length", "<="),
+    "min_identity": ("identity", ">="),
+    "max_identity": ("identity", "<="),
+    "min_affinity": ("affinity", ">="),
+    "max_affinity": ("affinity", "<="),
+}
+# the one parameter of these is the docked ligand that `affinity` refers to
+AFFINITY_JOIN = "LEFT JOIN candidate_affinities a ON a.seq_hash = rc.seq_hash AND a.ligand = ?"
+FROM_SQL = f"FROM run_candidates rc JOIN candidates c ON c.seq_hash = rc.seq_hash {AFFINITY_JOIN}"
+# docked candidates in affinity order, read from the (ligand, affinity) index of
+# candidate_affinities (CROSS JOIN keeps SQLite from reordering the tables)
+DOCKED_FROM_SQL = ("FROM candidate_affinities a CROSS JOIN run_candidates rc "
+                   "ON rc.seq_hash = a.seq_hash AND a.ligand = ? JOIN candidates c ON c.seq_hash = rc.seq_hash")
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+# --- Importing ---
+
+def _read_fasta(path):
+    """(header without ">", sequence) of a single-record FASTA file."""
+    lines = Path(path).read_text().splitlines()
+    header = next((line[1:].strip() for line in lines if line.startswith(">")), "")
+    return header, "".join(line.strip() for line in lines if not line.startswith(">"))
+
+def index_directory(ligand, static_root=STATIC_ROOT, path=None):
+    """
+    One-off import of an existing static/<ligand>_pdb_files folder written by
+    receptor.py (candidate_N_<ligand>.fasta, mutations_candidate_N_*.txt and
+    the template <ligand>.fasta), as the run "<ligand>-folder". Mutations
+    are recorded under the template's UniProt id, as receptor.py does.
+    """
+    from blast import sequence_identity
+
+    folder = Path(static_root) / f"{ligand}_pdb_files"
+    template_fasta = folder / f"{ligand}.fasta"
+    template, template_id = None, None
+    if template_fasta.exists():
+        header, template = _read_fasta(template_fasta)
+        template_id = header.split("|")[-1]                 # ">original|<uniprot_id>"
+
+    candidates = []
+    for fasta in sorted(folder.glob("candidate_*.fasta")):
+        name = "_".join(fasta.name.split("_")[:2])
+        header, sequence = _read_fasta(fasta)
+        if template_id is None and "|from_" in header:      # ">candidate_N|from_<uniprot_id>"
+            template_id = header.split("|from_")[-1]
+        mutation_files = list(folder.glob(f"mutations_{name}_*.txt"))
+        if mutation_files:
+            mutations = mutation_files[0].read_text().split()
+        else:
+            # receptor.py writes no file for a candidate without mutations
+            mutations = [] if template else None
+        candidates.append({
+            "name": name,
+            "filename": fasta.name,
+            "sequence": sequence,
+            "mutations": mutations,
+            "identity": round(sequence_identity(template, sequence), 4) if template else None,
+        })
+    run_id = f"{ligand}-folder"
+    results_db.start_run(run_id, "import", ligand=ligand, path=path)
+    results_db.add_candidates(run_id, candidates, template=template_id, ligand=ligand, path=path)
+    return len(candidates)
+
+
+# --- Querying ---
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(key, list) or len(key) != 3:
+            raise ValueError
+        return key
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+def query_candidates(ligand=None, filters=None, sort="id", order="asc", fields=None,
+                     limit=DEFAULT_LIMIT, cursor=None, dock_ligand=None, path=None):
+    """
+    Returns one page of candidates and the cursor for the next page.
+    `ligand` is the design target the candidates were generated for;
+    `affinity` is a candidate's best Vina affinity against `dock_ligand`
+    from any docking of it, and null without one.
+
+    Pagination is keyset-based on (sort column, id), so every page costs the
+    same regardless of how deep it is. Candidates without a value for the
+    sort column (e.g. not docked yet) come last in both orders, by id. They
+    are a separate keyset range, so both ranges are read in order from an
+    index instead of sorting the ligand's whole set.
+    """
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be 'asc' or 'desc'")
+    fields = list(fields or DEFAULT_FIELDS)
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    limit = max(1, min(int(limit), MAX_LIMIT))
+
+    where, params, affinity_filter = [], [], False
+    if ligand:
+        where.append("rc.ligand = ?")
+        params.append(ligand)
+    for key, value in (filters or {}).items():
+        if key not in FILTERS:
+            raise ValueError(f"Unknown filter: {key}")
+        field, op = FILTERS[key]
+        if field == "affinity":
+            if dock_ligand is None:
+                raise ValueError(f"{key} needs dock_ligand")
+            affinity_filter = True
+        where.append(f"{FIELD_SQL[field]} {op} ?")
+        params.append(float(value))
+    if sort == "affinity" and dock_ligand is None:
+        raise ValueError("sort=affinity needs dock_ligand")
+    count_sql = "SELECT COUNT(*) FROM run_candidates rc"
+    count_params = list(params)
+    if affinity_filter:
+        count_sql += f" {AFFINITY_JOIN}"
+        count_params.insert(0, dock_ligand)
+    if where:
+        count_sql += " WHERE " + " AND ".join(where)
+
+    column = FIELD_SQL[sort]
+    direction = order.upper()
+    cmp = ">" if order == "asc" else "<"
+    is_null, value, last_id = decode_cursor(cursor) if cursor else (False, None, None)
+    # keyset ranges read in turn: (FROM, conditions, parameters, ORDER BY)
+    ranges = []
+    if sort == "id":
+        ranges.append((FROM_SQL, [f"rc.rowid {cmp} ?"], [last_id], f"rc.rowid {direction}") if cursor else
+                      (FROM_SQL, [], [], f"rc.rowid {direction}"))
+    else:
+        if not is_null:
+            from_sql = DOCKED_FROM_SQL if sort == "affinity" else FROM_SQL
+            order_by = f"{column} {direction}, rc.rowid {direction}"
+            # spelled out rather than as a row value, which SQLite cannot use across two tables
+            ranges.append((from_sql, [f"{column} {cmp}= ?", f"({column} {cmp} ? OR rc.rowid {cmp} ?)"],
+                           [value, value, last_id], order_by) if cursor else
+                          (from_sql, [f"{column} IS NOT NULL"], [], order_by))
+        ranges.append((FROM_SQL, [f"{column} IS NULL", "rc.rowid > ?"], [last_id], "rc.rowid ASC") if is_null else
+                      (FROM_SQL, [f"{column} IS NULL"], [], "rc.rowid ASC"))
+
+    select = list(dict.fromkeys(fields + ["id", sort]))
+    select_sql = f"SELECT {', '.join(f'{FIELD_SQL[f]} AS {f}' for f in select)}"
+
+    rows = []
+    conn = results_db.connect(path)
+    try:
+        for from_sql, conditions, range_params, order_by in ranges:
+            if len(rows) > limit:
+                break
+            clauses = where + conditions
+            sql = f"{select_sql} {from_sql}" + (" WHERE " + " AND ".join(clauses) if clauses else "")
+            sql += f" ORDER BY {order_by} LIMIT ?"
+            rows += conn.execute(sql, [dock_ligand] + params + range_params + [limit + 1 - len(rows)]).fetchall()
+        total = conn.execute(count_sql, count_params).fetchone()[0]
+    finally:
+        conn.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([int(last[sort] is None), last[sort], last["id"]])
+
+    items = []
+    for row in rows:
+        item = {f: row[f] for f in fields}
+        if "mutations" in item and item["mutations"] is not None:
+            item["mutations"] = json.loads(item["mutations"])
+        items.append(item)
+    return {"items": items, "next_cursor": next_cursor, "total": total}
+
+
+if __name__ == "__main__":
+    for ligand_key in sys.argv[1:]:
+        count = index_directory(ligand_key)
+        print(f"✅ Indexed {count} candidates for {ligand_key} into {results_db.DB_PATH}")
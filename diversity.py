@@ -0,0 +1,199 @@
+# diversity.py
+
+import json
+import threading
+import zlib
+import numpy as np
+from collections import defaultdict
+from blast import sequence_identity
+
+# --- Configuration ---
+KMER_SIZE = 3
+NUM_PERM = 64
+LSH_BANDS = 16                      # NUM_PERM must be divisible by LSH_BANDS
+IDENTITY_THRESHOLD = 0.9
+MERSENNE_PRIME = (1 << 31) - 1
+SEED = 42
+
+
+# --- Part 1: MinHash Sketches ---
+
+def kmer_hashes(sequence, k=KMER_SIZE):
+    """Returns the set of 31-bit hashes of all k-mers in a sequence."""
+    if len(sequence) < k:
+        kmers = {sequence}
+    else:
+        kmers = {sequence[i:i + k] for i in range(len(sequence) - k + 1)}
+    return np.fromiter(
+        (zlib.crc32(kmer.encode()) & MERSENNE_PRIME for kmer in kmers),
+        dtype=np.uint64, count=len(kmers)
+    )
+
+def minhash_signatures(sequences, num_perm=NUM_PERM, k=KMER_SIZE, seed=SEED):
+    """
+    Builds a (len(sequences), num_perm) MinHash signature matrix using
+    universal hashing (a*x + b) mod p over the k-mer hashes.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    signatures = np.full((len(sequences), num_perm), MERSENNE_PRIME, dtype=np.uint64)
+    for i, seq in enumerate(sequences):
+        hashes = kmer_hashes(seq, k)
+        if hashes.size == 0:
+            continue
+        # a, x < 2^31 so a*x + b fits in uint64 without overflow
+        signatures[i] = ((a * hashes[None, :] + b) % MERSENNE_PRIME).min(axis=1)
+    return signatures
+
+
+# --- Part 2: Locality Sensitive Hashing ---
+
+def lsh_buckets(signatures, bands=LSH_BANDS):
+    """
+    Splits each signature into bands and yields, band by band, every bucket
+    of indices that share an identical band. Only sequences sharing a bucket
+    are aligned later.
+    """
+    num_perm = signatures.shape[1]
+    if num_perm % bands != 0:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+    rows = num_perm // bands
+
+    for band in range(bands):
+        buckets = defaultdict(list)
+        chunk = signatures[:, band * rows:(band + 1) * rows]
+        for i, row in enumerate(chunk):
+            buckets[row.tobytes()].append(i)
+        for members in buckets.values():
+            if len(members) > 1:
+                yield members
+
+
+# --- Part 3: Clustering ---
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def cluster_sequences(sequences, identity_threshold=IDENTITY_THRESHOLD,
+                      num_perm=NUM_PERM, bands=LSH_BANDS, k=KMER_SIZE):
+    """
+    Groups near-duplicate sequences. Sequences sharing an LSH bucket are
+    confirmed by alignment identity and merged with union-find. Within a
+    bucket each member is aligned only against one member of every cluster
+    already seen there, so a bucket of n near-identical sequences costs n
+    alignments, not n^2 pairs.
+
+    Returns a list of clusters, each a list of indices into `sequences`.
+    The first index in every cluster is its representative (the longest
+    member, the earliest generated among equals), and clusters are ordered
+    by their earliest member.
+    """
+    n = len(sequences)
+    if n == 0:
+        return []
+
+    signatures = minhash_signatures(sequences, num_perm=num_perm, k=k)
+    parent = list(range(n))
+    aligned = confirmed = 0
+    rejected = set()                  # pairs already aligned below the threshold in an earlier band
+    for members in lsh_buckets(signatures, bands=bands):
+        anchors = {}                  # root -> member aligned on behalf of that cluster
+        for i in members:
+            root_i = _find(parent, i)
+            if root_i in anchors:
+                continue
+            for root_j, j in list(anchors.items()):
+                if (j, i) in rejected:
+                    continue
+                aligned += 1
+                if sequence_identity(sequences[i], sequences[j]) >= identity_threshold:
+                    del anchors[root_j]
+                    parent[max(root_i, root_j)] = root_i = min(root_i, root_j)
+                    confirmed += 1
+                    break
+                rejected.add((j, i))
+            anchors[root_i] = i
+    print(f"--> LSH proposed {aligned} alignments out of {n * (n - 1) // 2} possible pairs")
+    print(f"--> Confirmed {confirmed} near-duplicate merges (identity >= {identity_threshold})")
+
+    clusters = defaultdict(list)
+    for i in range(n):
+        clusters[_find(parent, i)].append(i)
+    ordered = []
+    for root in sorted(clusters):
+        members = clusters[root]
+        representative = max(members, key=lambda i: (len(sequences[i]), -i))
+        ordered.append([representative] + [i for i in members if i != representative])
+    return ordered
+
+class NearDuplicateIndex:
+    """
+    Incremental version of cluster_sequences for candidates that arrive one
+    at a time (see pipeline_engine.py). Each new sequence is checked against
+    the LSH buckets of the sequences accepted so far.
+    """
+
+    def __init__(self, identity_threshold=IDENTITY_THRESHOLD, num_perm=NUM_PERM, bands=LSH_BANDS, k=KMER_SIZE):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.identity_threshold = identity_threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.k = k
+        self.representatives = []
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+        self.lock = threading.Lock()
+
+    def add(self, sequence):
+        """
+        Returns the index of an accepted sequence that `sequence` duplicates,
+        or None if it is new, in which case it is accepted and indexed.
+        """
+        signature = minhash_signatures([sequence], num_perm=self.num_perm, k=self.k)[0]
+        keys = [signature[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+        with self.lock:
+            checked = set()
+            for band, key in enumerate(keys):
+                for i in self.buckets[band].get(key, []):
+                    if i in checked:
+                        continue
+                    checked.add(i)
+                    if sequence_identity(self.representatives[i], sequence) >= self.identity_threshold:
+                        return i
+            index = len(self.representatives)
+            self.representatives.append(sequence)
+            for band, key in enumerate(keys):
+                self.buckets[band][key].append(index)
+            return None
+
+def select_representatives(sequences, identity_threshold=IDENTITY_THRESHOLD):
+    """
+    Removes near-duplicates from a list of generated sequences.
+
+    Returns (representatives, clusters) where representatives is the list of
+    sequences to pass downstream and clusters[i] holds the original indices
+    of the sequences represented by representatives[i].
+    """
+    clusters = cluster_sequences(sequences, identity_threshold=identity_threshold)
+    representatives = [sequences[members[0]] for members in clusters]
+    print(f"SUCCESS: Kept {len(representatives)} representatives from {len(sequences)} sequences.")
+    return representatives, clusters
+
+def save_cluster_membership(clusters, output_path):
+    """Writes cluster membership as JSON, keyed by the downstream candidate name."""
+    membership = {
+        f"candidate_{i + 1}": {
+            "representative": members[0] + 1,
+            "members": [m + 1 for m in members]
+        }
+        for i, members in enumerate(clusters)
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(membership, f, indent=2)
+    print(f"✅ Saved cluster membership to: {output_path}")
@@ -96,11 +96,15 @@ if [ ! -f "results/results_table.csv" ]; then
 	echo "Average dist from rmsd value,Maximum dist from rmsd value,Lowest affinity value,Average best mode rmsd value,Result seed,Result number" > results_table.csv
 fi
 config=$(ls | grep 'conf.txt')
-result_count=$(ls -A results/ | wc -l)
+result_count=$(ls -A results/ | grep -c '^result_')
+new_results=()
 for ((i = $result_count+1; i<=maxattempt; i++))
 do
 	echo "$i started..."
 	Windows-vina --config $config > results/result_$i.txt
+	# keep every attempt's poses, the next attempt overwrites vina_out.pdbqt
+	[ -f vina_out.pdbqt ] && mv vina_out.pdbqt results/vina_out_$i.pdbqt
+	new_results+=("results/result_$i.txt")
 	linenum=$(wc -l results/result_$i.txt | awk -F' ' '{print $1}')
 	if [ "$linenum" -gt 35 ]
 	then
@@ -124,6 +128,19 @@ echo "Process finished"
 #echo "Analyzing results..."
 #python filter_results.py
 
+# keep the Vina config next to the logs (the cleanup below deletes it)
+cp "$config" results/conf.txt 2>/dev/null
+
+# record seed, exhaustiveness and all modes/poses of this run's attempts in the results database,
+# and re-rank the poses by their contacts with the catalytic residues (ENDZYME_CATALYTIC_RESIDUES="D197 E198")
+# (ENDZYME_ROOT is set when this folder is a per-candidate copy, see pipeline_engine.py;
+#  the pipeline sets ENDZYME_RECORD_RESULTS=0 and records and analyzes them itself)
+if [ ${#new_results[@]} -gt 0 ] && [ "${ENDZYME_RECORD_RESULTS:-1}" != "0" ]; then
+	"${PYTHON:-python}" "${ENDZYME_ROOT:-..}/results_db.py" dock "$ligand" "$receptor" "$config" "${new_results[@]}" \
+		--structure "../static/${receptor}_pdb_files/${receptor}.cif" --json "../static/${receptor}_pdb_files/pose_ranking.json" \
+	|| echo "[WARN] Could not record docking results in results_db"
+fi
+
 # cp csv
 cp results_table.csv ../static/${receptor}_pdb_files/results_table.csv
 echo "CSV copied to static directory."
@@ -1,3 +1,7 @@
+import profiling
+if __name__ == "__main__":
+    # no-op unless ENDZYME_PROFILE is set
+    profiling.start_process_profile("getLigand")
 import requests
 import os
 import re
@@ -7,10 +11,11 @@ from urllib.parse import quote
 
 # --- Configuration ---
 # API endpoints and local file paths
-UNIPROT_SEARCH_URL = "https://rest.uniprot.org/uniprotkb/search"
-ALPHA_FOLD_API_URL = "https://alphafold.ebi.ac.uk/api/prediction"
-PUBCHEM_API_URL = "https://pubchem.ncbi.nlm.nih.gov/rest/pug"
-KEGG_REST_URL = "https://rest.kegg.jp"
+# (endpoints can be overridden by environment, e.g. for the offline benchmark)
+UNIPROT_SEARCH_URL = os.environ.get("UNIPROT_SEARCH_URL", "https://rest.uniprot.org/uniprotkb/search")
+ALPHA_FOLD_API_URL = os.environ.get("ALPHA_FOLD_API_URL", "https://alphafold.ebi.ac.uk/api/prediction")
+PUBCHEM_API_URL = os.environ.get("PUBCHEM_API_URL", "https://pubchem.ncbi.nlm.nih.gov/rest/pug")
+KEGG_REST_URL = os.environ.get("KEGG_REST_URL", "https://rest.kegg.jp")
 OUTPUT_DIR = "enzyme_ligand_structures"
 
 # Use a session with a retry strategy for robust network requests
@@ -27,6 +32,7 @@ def print_step(message):
     print("\n" + "="*60)
     print(f"STEP: {message}")
     print("="*60)
+    profiling.mark_stage(message)
 
 def setup_environment():
     """Creates the necessary output directory."""
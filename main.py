@@ -5,10 +5,19 @@ import sys
 import logging
 import subprocess
 import csv
+import shutil
+import threading
 import uuid
 from datetime import datetime
 from pathlib import Path
 from blast import align_sequences
+import profiling
+from profiling import child_env
+from candidate_index import query_candidates, FILTERS
+import results_db
+from pipeline_engine import build_design_pipeline, prepare_docking_workspace, read_best_affinity
+from pose_analysis import analyze_docking_runs, candidate_seq_hash, write_ranking, CATALYTIC_ENV
+import task_queue
 
 CONDA_PREFIX = os.environ.get("CONDA_PREFIX", "/home/richie/miniconda3")
 
@@ -28,6 +37,8 @@ RUNS_ROOT.mkdir(parents=True, exist_ok=True)
 AF2_PATH = APP_ROOT / "localcolabfold/colabfold-conda/bin/colabfold_batch"
 
 app = Flask(__name__, static_url_path='/static', static_folder='static')
+# opt-in profiling: "X-Endzyme-Profile: 1" header or ENDZYME_PROFILE=1
+profiling.init_app(app)
 
 # for setting server
 # CORS(app,resources={
@@ -62,9 +73,11 @@ def receive_ligand():
     ligand = data.get('ligand', '')
     number = data.get('number_of_generate', '')
     max_length = data.get('max_length', '')
+    ec_number = data.get('ec_number', '')  # optional, ZymCTRL conditioning (e.g. "3.2.1.52")
     try:
-        subprocess.run([PYTHON_FOR_RECEPTOR_PY, str(RECEPTOR), ligand, number, max_length],
+        subprocess.run([PYTHON_FOR_RECEPTOR_PY, str(RECEPTOR), ligand, number, max_length, ec_number],
             cwd=str(APP_ROOT),
+            env=child_env(),
             capture_output=True,
             text=True,
             check=True)
@@ -88,10 +101,21 @@ def confirm_candidate():
 
     # start generate .pdbfile
     ligand = data.get('ligand', '') #ex. PGA
-    user_fasta = APP_ROOT / "static" /f"{ligand}" +"_pdb_files" / f"{candidate}" + "_" +f"{ligand}" + ".fasta"
-    af2_dir = APP_ROOT / "static" /f"{ligand}" +"_pdb_files" / "af2"
+    user_fasta = APP_ROOT / "static" / f"{ligand}_pdb_files" / f"{candidate}_{ligand}.fasta"
+    af2_dir = APP_ROOT / "static" / f"{ligand}_pdb_files" / "af2"
     af2_dir.mkdir(parents=True, exist_ok=True)
-    subprocess.run([AF2_PATH,"--msa-mode single_sequence" ,user_fasta,af2_dir, "--num-recycle", 1, '--num-models', 2])
+    cmd = [str(AF2_PATH), "--msa-mode", "single_sequence", str(user_fasta), str(af2_dir), "--num-recycle", "1", "--num-models", "2"]
+
+    if task_queue.queue_enabled():
+        # worker mode: only enqueue, a fold worker runs ColabFold
+        info = launch(cmd, af2_dir)
+        return jsonify({"message": f"✅ ColabFold queued for {candidate}", "task_id": info["task_id"]}), 202
+
+    try:
+        subprocess.run(cmd, env=child_env(), check=True)
+    except (subprocess.CalledProcessError, OSError) as e:
+        return jsonify({"error": f"❌ ColabFold failed：{e}"}), 500
+    return jsonify({"message": f"✅ ColabFold finished for {candidate}"})
     
 @app.route('/api/dockLigand', methods=['POST'])
 def receive_dockLigand():
@@ -100,6 +124,7 @@ def receive_dockLigand():
     try:
         subprocess.run([PYTHON, str(GET_LIGAND), dockLigand],
             cwd=str(APP_ROOT),
+            env=child_env(),
             capture_output=True,
             text=True,
             check=True)
@@ -112,12 +137,30 @@ def start_docking():
     data = request.get_json()
     ligand = data.get("ligand", "")
     receptor = data.get("receptor", "")
+    catalytic = data.get("catalytic_residues") or os.environ.get(CATALYTIC_ENV, "")
+    catalytic = (catalytic.split() if isinstance(catalytic, str) else list(catalytic)) or None
 
     if not ligand or not receptor:
         return jsonify({"error": "❌ There is no ligand or receptor"}), 400
-    
+
+    if task_queue.queue_enabled():
+        # worker mode: dock a private copy of the layout on a worker host
+        structure = APP_ROOT / "static" / f"{receptor}_pdb_files" / f"{receptor}.cif"
+        work = RUNS_ROOT / "dock" / f"{receptor}_{uuid.uuid4().hex[:8]}"
+        try:
+            docking_dir = prepare_docking_workspace(work, ligand, receptor, structure)
+        except (RuntimeError, OSError) as e:
+            return jsonify({"error": f"❌ Docking failed：{e}"}), 400
+        task_id = task_queue.enqueue("dock", {"cmd": ["bash", "script.sh", ligand, receptor], "cwd": str(docking_dir),
+                                              "log": str(work / "docking.log"), "env": {"ENDZYME_RECORD_RESULTS": "0"}})
+        threading.Thread(target=_collect_docking, args=(task_id, work, ligand, receptor, catalytic), daemon=True).start()
+        return jsonify({"message": "✅ Docking queued", "task_id": task_id}), 202
+
+    env = dict(child_env() or os.environ)
+    if catalytic:
+        env[CATALYTIC_ENV] = " ".join(catalytic)
     try:
-        result = subprocess.run(["bash", "script.sh", ligand, receptor], cwd="./dockingFolder", text=True,capture_output=True,check=True)
+        result = subprocess.run(["bash", "script.sh", ligand, receptor], cwd="./dockingFolder", text=True,capture_output=True,check=True, env=env)
         output = result.stdout
         error_output = result.stderr
         return jsonify ({"message": "✅ Docking successful executed",
@@ -126,6 +169,34 @@ def start_docking():
     except subprocess.CalledProcessError as e:
         return jsonify({"error": f"❌ Docking failed：{e}"}), 500
 
+def _collect_docking(task_id, work, ligand, receptor, catalytic=None):
+    """Waits for a queued docking task, then publishes its results like script.sh does locally."""
+    try:
+        task_queue.wait(task_id)
+        results_csv = work / "static" / f"{receptor}_pdb_files" / "results_table.csv"
+        best = read_best_affinity(results_csv)
+        shutil.copy(results_csv, APP_ROOT / "static" / f"{receptor}_pdb_files" / "results_table.csv")
+        results_dir = work / "dockingFolder" / "results"
+        structure = work / "static" / f"{receptor}_pdb_files" / f"{receptor}.cif"
+        docking_runs = results_db.record_vina_results(ligand, receptor, results_dir / "conf.txt",
+                                                      sorted(results_dir.glob("result_*.txt")),
+                                                      seq_hash=candidate_seq_hash(structure))
+        ranking = analyze_docking_runs(structure, docking_runs, catalytic)
+        write_ranking(APP_ROOT / "static" / f"{receptor}_pdb_files" / "pose_ranking.json", ranking, catalytic)
+        logging.info("Docking task %s finished: %s/%s best affinity %s", task_id, ligand, receptor, best)
+    except Exception:
+        logging.exception("Docking task %s failed", task_id)
+
+@app.route('/api/tasks/<task_id>')
+def task_status(task_id):
+    """State of a queued fold/dock task (pending, running, done or failed)."""
+    if not task_queue.queue_enabled():
+        return jsonify({"ok": False, "error": "Worker mode is off (ENDZYME_QUEUE_DIR is not set)"}), 404
+    task = task_queue.status(task_id)
+    if task is None:
+        return jsonify({"ok": False, "error": "Task not found"}), 404
+    return jsonify({"ok": True, **task})
+
 @app.route("/api/alignment", methods=["POST","OPTIONS"])
 def api_alingment():
     if request.method == "OPTIONS":
@@ -172,17 +243,27 @@ def _build_colab_cmd(csv_path: Path, job_dir: Path,
 
     return cmd
 
-def launch(cmd, job_dir: Path):
+def launch(cmd, job_dir: Path, force_cpu=False):
     job_dir.mkdir(parents=True, exist_ok=True)
     log_path = job_dir / f"run_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"
+    extra_env = {"CUDA_VISIBLE_DEVICES": ""} if force_cpu else {}
+
+    if task_queue.queue_enabled():
+        # worker mode: a worker host runs ColabFold; job_dir must be on shared storage
+        task_id = task_queue.enqueue("fold", {"cmd": [str(c) for c in cmd], "cwd": str(job_dir), "log": str(log_path),
+                                              "env": extra_env})
+        (job_dir / "task_id").write_text(f"{task_id}\n")
+        return {"ok": True, "log": log_path.name, "pid": None, "task_id": task_id}
 
     lf = open(log_path, "w")
     lf.write("Command: " + " ".join(cmd) + "\n\n"); lf.flush()
 
+    env = dict(child_env() or os.environ, **extra_env)
     proc = subprocess.Popen(
         cmd, cwd=str(job_dir),
         stdout=lf, stderr=lf,
         start_new_session=True,      # zombie
+        env=env,
     )
     (job_dir / "pid").write_text(f"{proc.pid}\n")
     return {"ok": True, "log": log_path.name, "pid": proc.pid}
@@ -241,6 +322,108 @@ def api_fold():
         "cmd": cmd
     })
 
+@app.route('/api/candidates')
+def api_candidates():
+    """
+    Query parameters:
+      ligand=PGA                                        (design target)
+      dock_ligand=GlcNAc                                (docked ligand that affinity refers to)
+      sort=mutation_count|length|identity|affinity|id   order=asc|desc
+      fields=name,length,identity,sequence              (comma separated)
+      limit=50 (max 500)   cursor=<next_cursor from the previous page>
+      min_/max_ mutations, length, identity, affinity   (filters)
+    """
+    args = request.args
+    filters = {key: args[key] for key in FILTERS if args.get(key) not in (None, "")}
+    fields = [f.strip() for f in args["fields"].split(",") if f.strip()] if args.get("fields") else None
+    try:
+        page = query_candidates(
+            ligand=args.get("ligand") or None,
+            filters=filters,
+            sort=args.get("sort", "id"),
+            order=args.get("order", "asc"),
+            fields=fields,
+            limit=args.get("limit", 50),
+            cursor=args.get("cursor"),
+            dock_ligand=args.get("dock_ligand") or None,
+        )
+    except ValueError as e:
+        return jsonify({"error": f"❌ {e}"}), 400
+    return jsonify(page)
+
+# --- Streaming design pipeline: generate -> screen -> fold -> dock ---
+PIPELINE_RUNS = {}
+
+@app.route('/api/pipeline', methods=['POST'])
+def start_pipeline():
+    """
+    JSON body:
+    {
+      "ligand": "PGA",                     template lookup, as in /api/ligand
+      "dockLigand": "GlcNAc",              enzyme_ligand_structures/<dockLigand>_ligand.sdf
+      "number_of_generate": 20,
+      "max_length": 300,
+      "ec_number": "3.2.1.52",             optional, defaults to the template enzyme's EC class
+      "workers": {"fold": 2, "dock": 4},
+      "queue_size": 4,
+      "models": 1,
+      "recycles": 1
+    }
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    ligand = data.get("ligand", "")
+    dock_ligand = data.get("dockLigand", "")
+    if not ligand or not dock_ligand:
+        return jsonify({"ok": False, "error": "❌ There is no ligand or dockLigand"}), 400
+
+    try:
+        number = int(data.get("number_of_generate", 10))
+        max_length = int(data["max_length"]) if data.get("max_length") else None
+        workers = {k: int(v) for k, v in (data.get("workers") or {}).items()}
+        queue_size = int(data.get("queue_size", 4))
+    except (TypeError, ValueError) as e:
+        return jsonify({"ok": False, "error": f"Invalid parameter: {e}"}), 400
+    models = data.get("models", 1)
+    recycles = data.get("recycles", 1)
+
+    run_id = uuid.uuid4().hex[:12]
+    run_dir = RUNS_ROOT / f"pipeline_{run_id}"
+    build_fold_cmd = lambda csv_path, job_dir: _build_colab_cmd(csv_path, job_dir, "none", None, False, models, recycles)
+    run = build_design_pipeline(ligand, dock_ligand, number, run_dir, build_fold_cmd, max_length=max_length,
+                                workers=workers, queue_size=queue_size, run_id=run_id,
+                                ec_number=data.get("ec_number") or None)
+    PIPELINE_RUNS[run_id] = run.start()
+    logging.info("Pipeline %s started: ligand=%s dockLigand=%s n=%d", run_id, ligand, dock_ligand, number)
+
+    return jsonify({"ok": True, "run_id": run_id, "run_dir": str(run_dir)})
+
+@app.route('/api/pipeline/<run_id>')
+def pipeline_status(run_id):
+    run = PIPELINE_RUNS.get(run_id)
+    if run is None:
+        return jsonify({"ok": False, "error": "Pipeline run not found"}), 404
+    return jsonify({"ok": True, **run.status()})
+
+# --- Results database (all campaigns) ---
+
+@app.route('/api/results/top')
+def results_top():
+    """Best docking runs for a ligand across all campaigns: ?ligand=GlcNAc&limit=20[&in_site=1]"""
+    ligand = request.args.get("ligand", "")
+    if not ligand:
+        return jsonify({"error": "❌ There is no ligand"}), 400
+    try:
+        limit = max(1, min(int(request.args.get("limit", 20)), 500))
+    except ValueError:
+        return jsonify({"error": "❌ limit must be an integer"}), 400
+    in_site = request.args.get("in_site", "0").lower() in ("1", "true", "yes")
+    return jsonify({"items": results_db.top_affinities(ligand, limit, in_site=in_site)})
+
+@app.route('/api/results/mutation/<mutation>')
+def results_mutation(mutation):
+    """Every candidate carrying a mutation, e.g. /api/results/mutation/A123G"""
+    return jsonify({"items": results_db.candidates_with_mutation(mutation)})
+
 
 if __name__ == '__main__':
     app.run(port=5001)
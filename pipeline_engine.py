@@ -0,0 +1,429 @@
+# pipeline_engine.py
+#
+# Streaming engine that runs the design campaign stages
+#   generate -> screen -> fold -> dock -> analyze
+# concurrently. Stages are connected by bounded queues, so a candidate is
+# docked while later candidates are still folding or being generated, and a
+# slow stage blocks the stages before it (backpressure) instead of letting
+# work pile up in memory.
+
+import csv
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from pathlib import Path
+from queue import Queue
+
+import profiling
+
+APP_ROOT = Path(__file__).resolve().parent
+DOCKING_DIR = APP_ROOT / "dockingFolder"
+LIGAND_DIR = APP_ROOT / "enzyme_ligand_structures"
+
+DEFAULT_QUEUE_SIZE = 4
+_DONE = object()
+
+logger = logging.getLogger(__name__)
+
+
+# --- Engine ---
+
+class Stage:
+    """
+    One step of a pipeline. `fn(item)` returns the item to pass on, or None
+    to drop it (e.g. a duplicate). `workers` threads run fn concurrently and
+    at most `queue_size` items wait in front of the stage.
+    """
+
+    def __init__(self, name, fn, workers=1, queue_size=DEFAULT_QUEUE_SIZE):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.queue = Queue(maxsize=max(1, int(queue_size)))
+        self.stats = {"in": 0, "out": 0, "dropped": 0, "failed": 0, "busy_seconds": 0.0}
+
+
+class PipelineRun:
+    """
+    Runs `source()` (an iterator of item dicts with an "id" key) through
+    `stages` on background threads. One run_id identifies the whole run.
+    `on_finish(run)` is called once the last stage has drained.
+    """
+
+    def __init__(self, source, stages, run_id=None, run_dir=None, on_finish=None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.run_dir = Path(run_dir) if run_dir else None
+        self.source = source
+        self.stages = stages
+        self.on_finish = on_finish
+        self.items = {}
+        self.generated = 0
+        self.results = []
+        self.state = "created"
+        self.error = None
+        self.started = None
+        self.finished = None
+        # set when the run is started from a profiled request: its threads join that profile
+        self.profile_job = profiling.current_job()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    # --- bookkeeping ---
+
+    def _track(self, item, stage, status, error=None):
+        with self._lock:
+            entry = self.items.setdefault(item["id"], {"id": item["id"]})
+            entry["stage"] = stage
+            entry["status"] = status
+            entry[f"{stage}_at"] = round(time.time() - self.started, 3)
+            if error:
+                entry["error"] = error
+
+    def _count(self, stage, key, value=1):
+        with self._lock:
+            stage.stats[key] += value
+
+    # --- threads ---
+
+    def _thread(self, target, *args):
+        with profiling.profile_thread(self.profile_job, f"pipeline_{threading.current_thread().name}"):
+            target(*args)
+
+    def _feed(self):
+        first = self.stages[0]
+        try:
+            for item in self.source():
+                self._track(item, "generate", "done")
+                self.generated += 1
+                first.queue.put(item)   # blocks while the first stage is full
+        except Exception as e:
+            logger.exception("Pipeline %s: source failed", self.run_id)
+            self.error = f"source failed: {e}"
+        finally:
+            for _ in range(first.workers):
+                first.queue.put(_DONE)
+
+    def _work(self, index, remaining):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                break
+            self._count(stage, "in")
+            self._track(item, stage.name, "running")
+            start = time.perf_counter()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                logger.exception("Pipeline %s: stage %s failed for %s", self.run_id, stage.name, item["id"])
+                self._count(stage, "failed")
+                self._track(item, stage.name, "failed", error=str(e))
+                continue
+            finally:
+                self._count(stage, "busy_seconds", time.perf_counter() - start)
+
+            if result is None:
+                self._count(stage, "dropped")
+                self._track(item, stage.name, "dropped")
+                continue
+            self._count(stage, "out")
+            self._track(result, stage.name, "done")
+            if next_stage:
+                next_stage.queue.put(result)
+            else:
+                with self._lock:
+                    self.results.append(result)
+
+        # the last worker of a stage to finish closes the next stage
+        with self._lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last:
+            if next_stage:
+                for _ in range(next_stage.workers):
+                    next_stage.queue.put(_DONE)
+            else:
+                self._finish()
+
+    def _finish(self):
+        self.finished = time.time()
+        if not self.error and not self.results:
+            self.error = "no candidate made it through every stage"
+        if self.error:
+            self.state = "failed"
+        elif any(stage.stats["failed"] for stage in self.stages):
+            self.state = "finished_with_errors"
+        else:
+            self.state = "finished"
+        logger.info("Pipeline %s %s in %.1fs", self.run_id, self.state, self.finished - self.started)
+        if self.run_dir:
+            self.run_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.run_dir / "pipeline_status.json", "w", encoding="utf-8") as f:
+                json.dump(self.status(), f, indent=2)
+        if self.on_finish:
+            try:
+                self.on_finish(self)
+            except Exception:
+                logger.exception("Pipeline %s: on_finish failed", self.run_id)
+
+    def start(self):
+        """Starts all stage workers and the source; returns immediately."""
+        self.started = time.time()
+        self.state = "running"
+        remaining = [stage.workers for stage in self.stages]
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                t = threading.Thread(target=self._thread, args=(self._work, index, remaining),
+                                     name=f"{self.run_id}-{stage.name}-{n}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        t = threading.Thread(target=self._thread, args=(self._feed,), name=f"{self.run_id}-source", daemon=True)
+        t.start()
+        self._threads.append(t)
+        return self
+
+    def wait(self):
+        for t in self._threads:
+            t.join()
+        return self
+
+    def status(self):
+        with self._lock:
+            end = self.finished or time.time()
+            return {
+                "run_id": self.run_id,
+                "state": self.state,
+                "error": self.error,
+                "elapsed_seconds": round(end - self.started, 3) if self.started else 0,
+                "generated": self.generated,
+                "stages": [{"name": s.name, "workers": s.workers, "queued": s.queue.qsize(),
+                            **{k: round(v, 3) for k, v in s.stats.items()}} for s in self.stages],
+                "items": list(self.items.values()),
+                "results": list(self.results),
+            }
+
+
+# --- Design Campaign Stages ---
+
+def run_command(kind, cmd, cwd, log_path, env=None):
+    """
+    Runs a fold/dock command, here or, when ENDZYME_QUEUE_DIR is set, on a
+    worker host (worker.py). Either way its output ends up in `cwd`, which
+    must then be on storage the workers share.
+    """
+    import task_queue
+
+    if task_queue.queue_enabled():
+        task_queue.run(kind, {"cmd": [str(c) for c in cmd], "cwd": str(cwd), "log": str(log_path),
+                              "env": {**profiling.job_env(), **(env or {})}})
+        return
+    with open(log_path, "w") as log:
+        subprocess.run(cmd, cwd=str(cwd), stdout=log, stderr=subprocess.STDOUT, check=True,
+                       env={**os.environ, "ENDZYME_ROOT": str(APP_ROOT), **profiling.job_env(), **(env or {})})
+
+def make_generate_source(ligand, num_to_generate, max_length=None, batch_size=4, ec_number=None):
+    """
+    Looks up the template enzyme for the ligand and yields ZymCTRL candidates
+    in small batches, so the first candidates reach screening early.
+    """
+    def source():
+        import receptor
+
+        protein_name = receptor.find_enzyme_for_ligand(ligand)
+        if not protein_name:
+            raise RuntimeError(f"no template enzyme for ligand '{ligand}'")
+        uniprot_id, template = receptor.get_uniprot_data_by_name(protein_name)
+        if not template:
+            raise RuntimeError(f"no UniProt sequence for '{protein_name}'")
+
+        ec = ec_number or receptor.find_ec_number_for_enzyme(protein_name)
+        generator = receptor.load_zymctrl_generator()
+        count = 0
+        while count < num_to_generate:
+            batch = min(batch_size, num_to_generate - count)
+            sequences = receptor.generate_novel_sequences_with_zymctrl(template, max_length, batch,
+                                                                       generator=generator, ec_number=ec)
+            if not sequences:
+                raise RuntimeError("ZymCTRL generation failed")
+            for seq in sequences:
+                count += 1
+                yield {"id": f"candidate_{count}", "sequence": receptor.clean_sequence(seq),
+                       "template": template, "uniprot_id": uniprot_id}
+    return source
+
+def make_screen_stage(run_dir, ligand, run_id, identity_threshold=None):
+    """
+    Drops near-duplicates, then records identity and mutations against the
+    template and records the candidate in the results database (which also
+    serves /api/candidates).
+    """
+    import results_db
+    from blast import sequence_identity
+    from diversity import NearDuplicateIndex, IDENTITY_THRESHOLD
+    from receptor import compare_sequences_to_find_mutations
+
+    index = NearDuplicateIndex(identity_threshold or IDENTITY_THRESHOLD)
+    fasta_dir = Path(run_dir) / "candidates"
+    fasta_dir.mkdir(parents=True, exist_ok=True)
+
+    def screen(item):
+        if not item["sequence"] or index.add(item["sequence"]) is not None:
+            return None
+        item["identity_to_template"] = round(sequence_identity(item["template"], item["sequence"]), 4)
+        item["mutations"] = compare_sequences_to_find_mutations(item["template"], item["sequence"])
+        item["fasta"] = str(fasta_dir / f"{item['id']}.fasta")
+        with open(item["fasta"], "w") as f:
+            f.write(f">{item['id']}|from_{item['uniprot_id']}\n{item['sequence']}\n")
+        item["seq_hash"] = results_db.add_candidates(run_id, [{
+            "name": item["id"], "filename": item["fasta"], "sequence": item["sequence"],
+            "mutations": item["mutations"], "identity": item["identity_to_template"]}],
+            template=item["uniprot_id"], ligand=ligand)[0]
+        return item
+    return screen
+
+def make_fold_stage(run_dir, build_cmd, run_id=None):
+    """
+    Folds one candidate with ColabFold. `build_cmd(csv_path, job_dir)` returns
+    the colabfold_batch command (main._build_colab_cmd).
+    """
+    import results_db
+
+    def fold(item):
+        job_dir = Path(run_dir) / "af2" / item["id"]
+        job_dir.mkdir(parents=True, exist_ok=True)
+        csv_path = job_dir / f"{item['id']}.csv"
+        with csv_path.open("w", newline="") as f:
+            w = csv.writer(f); w.writerow(["id", "sequence"]); w.writerow([item["id"], item["sequence"]])
+
+        run_command("fold", build_cmd(csv_path, job_dir), job_dir, job_dir / "colabfold.log")
+
+        models = sorted(job_dir.glob(f"{item['id']}_*rank_001*.pdb"))
+        if not models:
+            raise RuntimeError(f"ColabFold produced no model for {item['id']}")
+        item["structure"] = str(models[0])
+        # every ranked model is recorded; rank 1 is the one docked
+        results_db.import_fold_dir(run_id, job_dir)
+        return item
+    return fold
+
+def save_as_mmcif(structure, target):
+    """Writes a PDB or mmCIF structure to `target` as mmCIF."""
+    from Bio.PDB import MMCIFIO, PDBParser
+
+    text = Path(structure).read_text(errors="replace")
+    if text.lstrip().startswith("data_"):
+        shutil.copy(structure, target)
+        return
+    io = MMCIFIO()
+    io.set_structure(PDBParser(QUIET=True).get_structure(Path(target).stem, str(structure)))
+    io.save(str(target))
+
+def prepare_docking_workspace(work, ligand, receptor, structure):
+    """
+    Lays out a private copy of the docking folder in `work`, as script.sh
+    expects it: dockingFolder/, static/<receptor>_pdb_files/<receptor>.cif
+    and enzyme_ligand_structures/<ligand>_ligand.sdf. A PDB structure (as
+    ColabFold writes them) is converted to mmCIF, since PyMOL picks its
+    parser from the extension.
+    """
+    ligand_sdf = LIGAND_DIR / f"{ligand}_ligand.sdf"
+    if not ligand_sdf.exists():
+        raise RuntimeError(f"Ligand file not found: {ligand_sdf} (run /api/dockLigand first)")
+    work = Path(work)
+    receptor_dir = work / "static" / f"{receptor}_pdb_files"
+    receptor_dir.mkdir(parents=True, exist_ok=True)
+    (work / "enzyme_ligand_structures").mkdir(exist_ok=True)
+    shutil.copy(ligand_sdf, work / "enzyme_ligand_structures" / ligand_sdf.name)
+    save_as_mmcif(structure, receptor_dir / f"{receptor}.cif")
+    # without results/ of earlier local runs, which script.sh would take as attempts already done
+    shutil.copytree(DOCKING_DIR, work / "dockingFolder", dirs_exist_ok=True,
+                    ignore=shutil.ignore_patterns("results", "__pycache__"))
+    return work / "dockingFolder"
+
+def read_best_affinity(results_csv):
+    """Lowest affinity in a script.sh results_table.csv."""
+    if not Path(results_csv).exists():
+        raise RuntimeError(f"Docking produced no results: {results_csv} is missing")
+    with open(results_csv, newline="") as f:
+        affinities = [float(row["Lowest affinity value"]) for row in csv.DictReader(f)
+                      if row.get("Lowest affinity value")]
+    return min(affinities) if affinities else None
+
+def make_dock_stage(run_dir, ligand, run_id=None):
+    """
+    Docks one folded candidate with dockingFolder/script.sh. Each candidate
+    gets its own copy of the docking layout so several can dock at once, on
+    this host or on workers. The Vina runs are recorded in the results
+    database from here, so only this process writes to it.
+    """
+    import results_db
+
+    def dock(item):
+        work = Path(run_dir) / "dock" / item["id"]
+        prepare_docking_workspace(work, ligand, item["id"], item["structure"])
+        docking_dir = work / "dockingFolder"
+        run_command("dock", ["bash", "script.sh", ligand, item["id"]], docking_dir, work / "docking.log",
+                    env={"ENDZYME_RECORD_RESULTS": "0"})
+
+        results_csv = work / "static" / f"{item['id']}_pdb_files" / "results_table.csv"
+        item["docking_results"] = str(results_csv)
+        item["best_affinity"] = read_best_affinity(results_csv)
+        item["docking_runs"] = results_db.record_vina_results(
+            ligand, item["id"], docking_dir / "results" / "conf.txt",
+            sorted((docking_dir / "results").glob("result_*.txt")), run_id=run_id, seq_hash=item.get("seq_hash"))
+        return item
+    return dock
+
+def make_analyze_stage(run_dir):
+    """
+    Re-ranks all docked poses of a candidate by their contacts with the
+    catalytic residues of its template (pose_analysis.py), so a strong pose
+    outside the active site does not count as the candidate's best.
+    """
+    import pose_analysis
+
+    def analyze(item):
+        catalytic = pose_analysis.template_catalytic_residues(item["uniprot_id"], item.pop("template", None),
+                                                              item["sequence"])
+        ranking = pose_analysis.analyze_docking_runs(item["structure"], item.get("docking_runs") or [], catalytic)
+
+        ranking_path = Path(run_dir) / "dock" / item["id"] / "pose_ranking.json"
+        pose_analysis.write_ranking(ranking_path, ranking, catalytic)
+        item["pose_ranking"] = str(ranking_path)
+        item["catalytic_residues"] = catalytic
+        best = ranking[0] if ranking else None
+        item["in_site"] = best["in_site"] if best else None      # None: no catalytic residues to check
+        item["best_site_affinity"] = best["affinity"] if item["in_site"] else None
+        item["best_pose"] = {k: best[k] for k in ("source", "mode", "affinity", "score", "contacts")} if best else None
+        return item
+    return analyze
+
+def build_design_pipeline(ligand, dock_ligand, num_to_generate, run_dir, build_fold_cmd, max_length=None,
+                          workers=None, queue_size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_QUEUE_SIZE, run_id=None,
+                          ec_number=None):
+    """
+    Wires generate -> screen -> fold -> dock -> analyze for one design campaign.
+    `workers` maps stage name to worker count, e.g. {"fold": 2, "dock": 4}.
+    """
+    import results_db
+
+    workers = workers or {}
+    run_id = run_id or uuid.uuid4().hex[:12]
+    results_db.start_run(run_id, "pipeline", ligand=ligand, dock_ligand=dock_ligand,
+                         params={"num_to_generate": num_to_generate, "max_length": max_length,
+                                 "workers": workers, "ec_number": ec_number})
+    stages = [
+        Stage("screen", make_screen_stage(run_dir, ligand, run_id), workers=1, queue_size=queue_size),
+        Stage("fold", make_fold_stage(run_dir, build_fold_cmd, run_id), workers=workers.get("fold", 1), queue_size=queue_size),
+        Stage("dock", make_dock_stage(run_dir, dock_ligand, run_id), workers=workers.get("dock", 1), queue_size=queue_size),
+        Stage("analyze", make_analyze_stage(run_dir), workers=1, queue_size=queue_size),
+    ]
+    source = make_generate_source(ligand, num_to_generate, max_length, batch_size=batch_size, ec_number=ec_number)
+    return PipelineRun(source, stages, run_id=run_id, run_dir=run_dir,
+                       on_finish=lambda run: results_db.finish_run(run.run_id, run.state))
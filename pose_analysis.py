@@ -0,0 +1,327 @@
+# pose_analysis.py
+#
+# Residue-level contact fingerprints of Vina poses and re-ranking against the
+# catalytic residues, so high-affinity poses outside the active site can be
+# rejected automatically instead of trusting Vina's affinity alone.
+#
+# All poses of a receptor are stacked into one NumPy array, ordered along a
+# Z-order curve and processed in blocks of nearby atoms: a KD-tree over the
+# receptor atoms picks the pocket around each block in one query, and the
+# block x pocket distances come from one matrix product, so thousands of
+# poses cost a few array operations rather than a Python loop per atom.
+#
+#   python pose_analysis.py <receptor.pdb|cif> <vina_out.pdbqt> [...] --catalytic D197 E198
+
+import argparse
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+from Bio.PDB import MMCIFParser, PDBParser
+from Bio.PDB.kdtrees import KDTree
+from Bio.PDB.Polypeptide import is_aa
+
+# distance cutoffs (A)
+CONTACT_CUTOFF = 4.5
+HBOND_CUTOFF = 3.5
+HYDROPHOBIC_CUTOFF = 4.0
+# AutoDock atom types of the ligand
+LIGAND_POLAR_TYPES = {"N", "NA", "NS", "O", "OA", "OS"}
+LIGAND_HYDROPHOBIC_TYPES = {"C", "A", "Cl", "CL", "Br", "BR", "I"}
+# fingerprint channels
+CONTACT, HBOND, HYDROPHOBIC = 0, 1, 2
+CHANNELS = ("contacts", "hbonds", "hydrophobic")
+# in_site of a pose: in the active site, rejected, or not checked (no catalytic residues)
+SITE_LABELS = {True: "in site  ", False: "REJECTED ", None: "unchecked"}
+# re-ranking: kcal/mol credited per catalytic residue touched / H-bonded
+CATALYTIC_CONTACT_BONUS = 0.5
+CATALYTIC_HBOND_BONUS = 0.5
+MIN_CATALYTIC_CONTACTS = 1
+# ligand atoms per distance block, and the grid (A) used to order them spatially
+BLOCK_ATOMS = 512
+MORTON_CELL = 4.0
+
+# catalytic residues of a docking job given on the command line / in the environment
+CATALYTIC_ENV = "ENDZYME_CATALYTIC_RESIDUES"
+# catalytic residues of the template enzymes, in UniProt numbering
+# (Q6GYA5: D197 and E198 of the conserved GH20 H-x-G-G-D-E motif)
+CATALYTIC_RESIDUES = {
+    "Q6GYA5": ["D197", "E198"],
+}
+
+THREE_TO_ONE = {
+    "ALA": "A", "ARG": "R", "ASN": "N", "ASP": "D", "CYS": "C", "GLN": "Q", "GLU": "E", "GLY": "G",
+    "HIS": "H", "ILE": "I", "LEU": "L", "LYS": "K", "MET": "M", "PHE": "F", "PRO": "P", "SER": "S",
+    "THR": "T", "TRP": "W", "TYR": "Y", "VAL": "V",
+}
+
+
+# --- Loading ---
+
+def load_receptor(path):
+    """
+    Heavy atoms of a receptor structure as arrays. Accepts PDB or mmCIF,
+    detected from the content: the bundled Q6GYA5_alphafold.cif is PDB text.
+    """
+    text = Path(path).read_text(errors="replace")
+    parser = MMCIFParser(QUIET=True) if text.lstrip().startswith("data_") else PDBParser(QUIET=True)
+    structure = parser.get_structure("receptor", str(path))
+    model = next(structure.get_models())
+    chains = [chain for chain in model]
+
+    coords, residue_index, polar, hydrophobic = [], [], [], []
+    residues, numbers = [], {}
+    for chain in chains:
+        for residue in chain:
+            if not is_aa(residue, standard=False):
+                continue
+            number = residue.id[1]
+            label = f"{THREE_TO_ONE.get(residue.get_resname(), 'X')}{number}"
+            if len(chains) > 1:
+                label = f"{chain.id}:{label}"
+            numbers.setdefault(number, len(residues))
+            for atom in residue:
+                element = (atom.element or atom.get_id()[0]).upper()
+                if element == "H":
+                    continue
+                coords.append(atom.coord)
+                residue_index.append(len(residues))
+                polar.append(element in ("N", "O"))
+                # carbonyl C is polar; side-chain/CA carbons and sulfur count as hydrophobic
+                hydrophobic.append((element == "C" and atom.get_id() != "C") or element == "S")
+            residues.append(label)
+
+    coords = np.asarray(coords, dtype=np.float64)
+    return {
+        "coords": coords,
+        "residue_index": np.asarray(residue_index, dtype=np.int64),
+        "polar": np.asarray(polar, dtype=bool),
+        "hydrophobic": np.asarray(hydrophobic, dtype=bool),
+        "residues": residues,
+        "sequence": "".join(label.split(":")[-1][0] for label in residues),
+        "numbers": numbers,
+        "kdtree": KDTree(coords, 10),
+    }
+
+def parse_pdbqt_poses(path):
+    """Every MODEL of a Vina output file as (mode, affinity, coords, polar mask, hydrophobic mask)."""
+    poses, mode, affinity, atoms = [], None, None, []
+    for line in Path(path).read_text(errors="replace").splitlines():
+        if line.startswith("MODEL"):
+            mode, affinity, atoms = int(line.split()[1]), None, []
+        elif line.startswith("REMARK VINA RESULT:"):
+            affinity = float(line.split()[3])
+        elif line.startswith(("ATOM", "HETATM")) and mode is not None:
+            atom_type = line[77:79].strip() or line[12:14].strip()
+            if atom_type in ("H", "HD", "HS"):
+                continue
+            atoms.append((float(line[30:38]), float(line[38:46]), float(line[46:54]), atom_type))
+        elif line.startswith("ENDMDL") and mode is not None:
+            if atoms:
+                types = [a[3] for a in atoms]
+                poses.append((mode, affinity, np.array([a[:3] for a in atoms], dtype=np.float64),
+                              np.array([t in LIGAND_POLAR_TYPES for t in types]),
+                              np.array([t in LIGAND_HYDROPHOBIC_TYPES for t in types])))
+            mode = None
+    return poses
+
+
+# --- Fingerprints ---
+
+def _morton_codes(coords):
+    """Z-order index of each point on a MORTON_CELL grid (10 bits per axis)."""
+    cells = np.floor((coords - coords.min(axis=0)) / MORTON_CELL).astype(np.uint64)
+    cells = np.minimum(cells, np.uint64(1023))
+    codes = np.zeros(len(coords), dtype=np.uint64)
+    for bit in range(10):
+        for axis in range(3):
+            codes |= ((cells[:, axis] >> np.uint64(bit)) & np.uint64(1)) << np.uint64(3 * bit + axis)
+    return codes
+
+def contact_fingerprints(receptor, pose_coords, pose_polar, pose_hydrophobic):
+    """
+    Fingerprints of many poses of one ligand in one receptor.
+
+    pose_coords is a list of (n_atoms, 3) arrays (one per pose). Returns a
+    boolean array (n_poses, n_residues, 3): contact / H-bond / hydrophobic.
+    """
+    n_poses, n_residues = len(pose_coords), len(receptor["residues"])
+    fingerprints = np.zeros((n_poses, n_residues, len(CHANNELS)), dtype=bool)
+    if n_poses == 0:
+        return fingerprints
+
+    coords = np.concatenate(pose_coords)
+    pose_index = np.repeat(np.arange(n_poses), [len(c) for c in pose_coords])
+    lig_polar = np.concatenate(pose_polar)
+    lig_hydrophobic = np.concatenate(pose_hydrophobic)
+
+    # blocks of spatially close atoms keep each pocket small when poses spread over the receptor
+    order = np.argsort(_morton_codes(coords), kind="stable")
+    coords, pose_index, lig_polar, lig_hydrophobic = (coords[order], pose_index[order], lig_polar[order],
+                                                      lig_hydrophobic[order])
+
+    for start in range(0, len(coords), BLOCK_ATOMS):
+        block = coords[start:start + BLOCK_ATOMS]
+        block_pose = pose_index[start:start + BLOCK_ATOMS]
+
+        # one KD-tree query per block: the receptor atoms that can touch any of its poses
+        center = block.mean(axis=0)
+        radius = float(np.sqrt(((block - center) ** 2).sum(axis=1).max())) + CONTACT_CUTOFF
+        pocket = np.fromiter((p.index for p in receptor["kdtree"].search(center, radius)), dtype=np.int64)
+        if pocket.size == 0:
+            continue
+        pocket_coords = receptor["coords"][pocket]
+
+        # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b for the whole block at once
+        d2 = (block ** 2).sum(axis=1)[:, None] + (pocket_coords ** 2).sum(axis=1)[None, :] - 2.0 * block @ pocket_coords.T
+        atom, partner = np.nonzero(d2 <= CONTACT_CUTOFF ** 2)
+        d2 = d2[atom, partner]
+        pose, residue, partner = block_pose[atom], receptor["residue_index"][pocket[partner]], pocket[partner]
+        atom = atom + start
+
+        fingerprints[pose, residue, CONTACT] = True
+        hbond = (d2 <= HBOND_CUTOFF ** 2) & lig_polar[atom] & receptor["polar"][partner]
+        fingerprints[pose[hbond], residue[hbond], HBOND] = True
+        hydrophobic = (d2 <= HYDROPHOBIC_CUTOFF ** 2) & lig_hydrophobic[atom] & receptor["hydrophobic"][partner]
+        fingerprints[pose[hydrophobic], residue[hydrophobic], HYDROPHOBIC] = True
+    return fingerprints
+
+def catalytic_indices(receptor, catalytic):
+    """
+    Residue indices of catalytic residues given as labels ("D197") or
+    numbers. Warns when the residue type at that position is different.
+    """
+    indices = []
+    for residue in catalytic or []:
+        match = re.fullmatch(r"([A-Z]?)(\d+)", str(residue).strip().upper())
+        if not match or int(match.group(2)) not in receptor["numbers"]:
+            print(f"WARNING: catalytic residue {residue} is not in the receptor")
+            continue
+        index = receptor["numbers"][int(match.group(2))]
+        if match.group(1) and not receptor["residues"][index].endswith(f"{match.group(1)}{match.group(2)}"):
+            print(f"WARNING: catalytic residue {residue} is {receptor['residues'][index]} in this receptor")
+        indices.append(index)
+    return indices
+
+
+# --- Re-ranking ---
+
+def rank_poses(receptor, poses, catalytic=None, sources=None):
+    """
+    Fingerprints and re-ranks poses (from parse_pdbqt_poses). Poses that
+    touch fewer than MIN_CATALYTIC_CONTACTS catalytic residues are rejected
+    and ranked after all others; the rest are ordered by Vina affinity minus
+    a bonus per catalytic contact and H-bond. Without catalytic residues
+    (none given, or none found in the receptor) the order is Vina's and
+    in_site is None: the site was not checked.
+    """
+    if not poses:
+        return []
+    fingerprints = contact_fingerprints(receptor, [p[2] for p in poses], [p[3] for p in poses],
+                                        [p[4] for p in poses])
+    affinity = np.array([p[1] if p[1] is not None else np.nan for p in poses], dtype=np.float64)
+    cat = catalytic_indices(receptor, catalytic)
+    if cat:
+        catalytic_contacts = fingerprints[:, cat, CONTACT].sum(axis=1)
+        catalytic_hbonds = fingerprints[:, cat, HBOND].sum(axis=1)
+        in_site = catalytic_contacts >= MIN_CATALYTIC_CONTACTS
+    else:
+        catalytic_contacts = catalytic_hbonds = np.zeros(len(poses), dtype=np.int64)
+        in_site = np.ones(len(poses), dtype=bool)
+    score = affinity - CATALYTIC_CONTACT_BONUS * catalytic_contacts - CATALYTIC_HBOND_BONUS * catalytic_hbonds
+    order = np.lexsort((np.nan_to_num(score, nan=np.inf), ~in_site))
+
+    residues = receptor["residues"]
+    ranked = []
+    for rank, i in enumerate(order, start=1):
+        row = {
+            "rank": rank,
+            "source": sources[i] if sources else None,
+            "mode": poses[i][0],
+            "affinity": poses[i][1],
+            "score": round(float(score[i]), 3),
+            "in_site": bool(in_site[i]) if cat else None,
+            "catalytic_contacts": int(catalytic_contacts[i]),
+            "catalytic_hbonds": int(catalytic_hbonds[i]),
+        }
+        for channel, name in enumerate(CHANNELS):
+            row[name] = [residues[r] for r in np.nonzero(fingerprints[i, :, channel])[0]]
+        ranked.append(row)
+    return ranked
+
+def analyze_pose_files(receptor_path, pdbqt_paths, catalytic=None):
+    """Loads all poses of all files against one receptor and ranks them together."""
+    receptor = load_receptor(receptor_path)
+    poses, sources = [], []
+    for path in pdbqt_paths:
+        for pose in parse_pdbqt_poses(path):
+            poses.append(pose)
+            sources.append(str(path))
+    return rank_poses(receptor, poses, catalytic, sources)
+
+def candidate_seq_hash(structure_path):
+    """
+    Sequence hash of a docked structure when it is a recorded candidate, so
+    docking started outside the pipeline is linked to it (and its affinity
+    reaches /api/candidates). None for templates and other structures.
+    """
+    import results_db
+
+    seq_hash = results_db.sequence_hash(load_receptor(structure_path)["sequence"])
+    return seq_hash if results_db.candidate_exists(seq_hash) else None
+
+def analyze_docking_runs(receptor_path, docking_runs, catalytic=None):
+    """
+    Ranks the poses of recorded Vina runs ([(docking run id, pdbqt path)], as
+    returned by results_db.record_vina_results) and stores their fingerprints
+    in the results database.
+    """
+    import results_db
+
+    run_of = {str(pdbqt): docking_run_id for docking_run_id, pdbqt in docking_runs if pdbqt}
+    ranking = analyze_pose_files(receptor_path, list(run_of), catalytic)
+    for row in ranking:
+        row["docking_run_id"] = run_of[row["source"]]
+    results_db.add_pose_fingerprints(ranking)
+    return ranking
+
+def write_ranking(path, ranking, catalytic=None):
+    """Writes pose_ranking.json: the catalytic residues used and the ranked poses."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"catalytic_residues": catalytic, "poses": ranking}, f, indent=2)
+
+def template_catalytic_residues(uniprot_id, template_sequence, sequence):
+    """
+    Catalytic residues of a template enzyme mapped onto a designed sequence
+    by alignment, as labels in the design's numbering (e.g. ["D201", "E202"]).
+    Labels keep the template's residue type, so catalytic_indices warns when
+    a design has mutated one away.
+    """
+    from blast import map_residue_numbers
+
+    catalytic = CATALYTIC_RESIDUES.get(uniprot_id)
+    if not catalytic or not template_sequence or not sequence:
+        return None
+    numbers = [int(re.sub(r"\D", "", c)) for c in catalytic]
+    mapped = map_residue_numbers(template_sequence, sequence, numbers)
+    return [f"{template_sequence[c - 1]}{mapped[c]}" for c in numbers if mapped.get(c) is not None]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Contact fingerprints and re-ranking of Vina poses")
+    parser.add_argument("receptor", help="receptor structure (PDB or mmCIF)")
+    parser.add_argument("poses", nargs="+", help="Vina output .pdbqt files")
+    parser.add_argument("--catalytic", nargs="*", default=None, help="catalytic residues, e.g. D197 E198")
+    parser.add_argument("--json", help="write the ranking to this file")
+    args = parser.parse_args()
+
+    ranking = analyze_pose_files(args.receptor, args.poses, args.catalytic)
+    if args.json:
+        write_ranking(args.json, ranking, args.catalytic)
+        print(f"✅ Wrote pose ranking to {args.json}")
+    for row in ranking[:10]:
+        print(f"{row['rank']:3d}  {row['affinity']:7.2f}  score {row['score']:7.2f}  "
+              f"{SITE_LABELS[row['in_site']]}  {Path(row['source']).name}#{row['mode']}  "
+              f"{' '.join(row['contacts'][:8])}")
+    rejected = sum(1 for row in ranking if row["in_site"] is False)
+    print(f"SUCCESS: ranked {len(ranking)} poses, {rejected} outside the active site")
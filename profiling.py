@@ -0,0 +1,249 @@
+# profiling.py
+#
+# Opt-in sampling profiler that writes speedscope files (https://speedscope.app).
+# Enabled per request with the "X-Endzyme-Profile: 1" header, or for everything
+# with ENDZYME_PROFILE=1. The flag and job id are passed to child processes
+# (receptor.py, getLigand.py, ...) through the environment, and to the
+# threads of a /api/pipeline run, so one job id collects the Flask handler,
+# its background threads and their subprocesses:
+#   profiles/<job_id>/<name>.speedscope.json
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+PROFILE_ENV = "ENDZYME_PROFILE"
+PROFILE_JOB_ENV = "ENDZYME_PROFILE_JOB"
+PROFILE_DIR_ENV = "ENDZYME_PROFILE_DIR"
+PROFILE_HEADER = "X-Endzyme-Profile"
+PROFILE_JOB_HEADER = "X-Endzyme-Profile-Job"
+SAMPLE_INTERVAL = float(os.environ.get("ENDZYME_PROFILE_INTERVAL", "0.005"))
+DEFAULT_PROFILE_DIR = Path(__file__).resolve().parent / "profiles"
+
+_current = threading.local()
+_process_profiler = None
+
+
+def profiling_enabled():
+    return os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes")
+
+def new_job_id():
+    return uuid.uuid4().hex[:12]
+
+def profile_dir(job_id):
+    path = Path(os.environ.get(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR)) / job_id
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def current_job():
+    """Job id being profiled on this thread, or None."""
+    return getattr(_current, "job_id", None)
+
+def job_env():
+    """Just the variables child_env() adds, e.g. for a task run on a worker host."""
+    job_id = current_job()
+    return {PROFILE_ENV: "1", PROFILE_JOB_ENV: job_id} if job_id else {}
+
+def child_env():
+    """
+    Environment for a subprocess started while a request is being profiled,
+    or None (inherit) otherwise. Pass it as subprocess.run(..., env=child_env()).
+    """
+    if current_job() is None:
+        return None
+    return dict(os.environ, **job_env())
+
+
+# --- Sampling Profiler ---
+
+class SamplingProfiler:
+    """
+    Samples the Python stack of one thread every `interval` seconds from a
+    background thread. Stage markers (see mark_stage) are kept as a second,
+    evented timeline in the same speedscope file.
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.frames = []
+        self.frame_index = {}
+        self.samples = []
+        self.weights = []
+        self.stages = []
+        self.start_time = None
+        self.end_time = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _frame_id(self, key):
+        index = self.frame_index.get(key)
+        if index is None:
+            index = len(self.frames)
+            self.frame_index[key] = index
+            name, file, line = key
+            self.frames.append({"name": name, "file": file, "line": line})
+        return index
+
+    def _sample(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(self._frame_id((code.co_name, code.co_filename, code.co_firstlineno)))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append(now - last)
+            last = now
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name="endzyme-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.end_time = time.perf_counter()
+        self.end_stage()
+        return self
+
+    def mark_stage(self, name):
+        """Ends the current stage (if any) and starts a new one."""
+        self.end_stage()
+        self.stages.append([name, time.perf_counter() - self.start_time, None])
+
+    def end_stage(self):
+        if self.stages and self.stages[-1][2] is None:
+            self.stages[-1][2] = time.perf_counter() - self.start_time
+
+    def write_speedscope(self, path, name):
+        duration = (self.end_time or time.perf_counter()) - self.start_time
+        profiles = [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": duration,
+            "samples": self.samples,
+            "weights": self.weights,
+        }]
+        if self.stages:
+            events = []
+            for stage, begin, end in self.stages:
+                frame = self._frame_id((f"stage: {stage}", "", 0))
+                events.append({"type": "O", "frame": frame, "at": begin})
+                events.append({"type": "C", "frame": frame, "at": end if end is not None else duration})
+            profiles.append({
+                "type": "evented",
+                "name": f"{name} stages",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": duration,
+                "events": events,
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "$schema": "https://www.speedscope.app/file-format-schema.json",
+                "exporter": "endzyme profiling.py",
+                "name": name,
+                "activeProfileIndex": 0,
+                "shared": {"frames": self.frames},
+                "profiles": profiles,
+            }, f)
+        return path
+
+
+# --- Whole-process profiling for receptor.py / getLigand.py ---
+
+def start_process_profile(name):
+    """
+    Profiles the main thread of this process until exit if ENDZYME_PROFILE is
+    set. Call it before heavy imports so import cost is included.
+    """
+    global _process_profiler
+    if not profiling_enabled() or _process_profiler is not None:
+        return None
+    job_id = os.environ.get(PROFILE_JOB_ENV) or new_job_id()
+    _current.job_id = job_id
+    _process_profiler = SamplingProfiler().start()
+
+    def _write():
+        _process_profiler.stop()
+        path = profile_dir(job_id) / f"{name}_{os.getpid()}.speedscope.json"
+        _process_profiler.write_speedscope(path, name)
+        print(f"[profile] wrote {path}")
+    atexit.register(_write)
+    return _process_profiler
+
+def mark_stage(name):
+    """Marks the start of an orchestrator stage in the process profile (no-op when not profiling)."""
+    if _process_profiler is not None:
+        _process_profiler.mark_stage(name)
+
+
+# --- Background threads ---
+
+@contextmanager
+def profile_thread(job_id, name):
+    """
+    Profiles the calling thread (e.g. a pipeline_engine.py stage worker) as
+    part of `job_id` and lets child_env() pass the job on to its
+    subprocesses. No-op when job_id is None.
+    """
+    if job_id is None:
+        yield
+        return
+    _current.job_id = job_id
+    profiler = SamplingProfiler().start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        _current.job_id = None
+        profiler.write_speedscope(profile_dir(job_id) / f"{name}.speedscope.json", name)
+
+
+# --- Flask ---
+
+def init_app(app):
+    """Profiles a request when it carries the profile header or ENDZYME_PROFILE is set."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_profile():
+        if request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes") or profiling_enabled():
+            g.profile_job = new_job_id()
+            g.profiler = SamplingProfiler().start()
+            _current.job_id = g.profile_job
+
+    @app.after_request
+    def _add_profile_header(response):
+        if getattr(g, "profile_job", None):
+            response.headers[PROFILE_JOB_HEADER] = g.profile_job
+        return response
+
+    @app.teardown_request
+    def _write_request_profile(exc):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return
+        _current.job_id = None
+        profiler.stop()
+        name = f"request_{request.endpoint or 'unknown'}"
+        path = profiler.write_speedscope(profile_dir(g.profile_job) / f"{name}.speedscope.json", name)
+        app.logger.info("Profile for %s %s written to %s", request.method, request.path, path)
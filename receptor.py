@@ -1,19 +1,33 @@
 # receptor.py
 
+import profiling
+if __name__ == "__main__":
+    # no-op unless ENDZYME_PROFILE is set; started before the other imports so their cost is profiled
+    profiling.start_process_profile("receptor")
 import requests
 import os
 import sys
 import json
 from transformers import pipeline
 from requests.adapters import HTTPAdapter, Retry
+from diversity import select_representatives, save_cluster_membership
+from blast import sequence_identity
+import results_db
 
 # --- Configuration ---
 # API endpoints and local file paths
+# (endpoints and model can be overridden by environment, e.g. for the offline benchmark)
 STATIC_ROOT = "static"
-UNIPROT_SEARCH_URL = "https://rest.uniprot.org/uniprotkb/search"
-ALPHA_FOLD_API_URL = "https://alphafold.ebi.ac.uk/api/prediction"
-OUTPUT_DIR = os.path.join(STATIC_ROOT, sys.argv[1] + "_pdb_files")
+UNIPROT_SEARCH_URL = os.environ.get("UNIPROT_SEARCH_URL", "https://rest.uniprot.org/uniprotkb/search")
+ALPHA_FOLD_API_URL = os.environ.get("ALPHA_FOLD_API_URL", "https://alphafold.ebi.ac.uk/api/prediction")
+ZYMCTRL_MODEL = os.environ.get("ZYMCTRL_MODEL", "AI4PD/ZymCTRL")
+# "pipeline" (transformers, default), or "cpu" / "onnx" for zymctrl_cpu.py
+ZYMCTRL_BACKEND = os.environ.get("ZYMCTRL_BACKEND", "pipeline")
+ZYMCTRL_SPECIAL_TOKENS = ("<|endoftext|>", "<sep>", "<start>", "<end>", "<pad>")
+# argv[1] is the ligand when run as a script; the fallback lets pipeline_engine.py import this module
+OUTPUT_DIR = os.path.join(STATIC_ROOT, (sys.argv[1] if len(sys.argv) > 1 else "pipeline") + "_pdb_files")
 OUTPUT_JS = os.path.join(OUTPUT_DIR, "candidate_data.js")
+OUTPUT_CLUSTERS = os.path.join(OUTPUT_DIR, "candidate_clusters.json")
 # --- Setup for Robust Network Requests ---
 # Use a session with a retry strategy
 retries = Retry(total=5, backoff_factor=0.25, status_forcelist=[500, 502, 503, 504])
@@ -36,6 +50,7 @@ def print_step(message):
     print("\n" + "="*60)
     print(f"STEP: {message}")
     print("="*60)
+    profiling.mark_stage(message)
 
 def setup_environment():
     """Creates the necessary output directory."""
@@ -78,6 +93,18 @@ def find_enzyme_for_ligand(ligand_description):
         print(f"WARNING: Could not find a known enzyme for '{ligand_description}'.")
         return None
 
+def find_ec_number_for_enzyme(enzyme_name):
+    """
+    EC number of a template enzyme, used as the ZymCTRL prompt so the model
+    generates sequences of the same enzyme class.
+    """
+    enzyme_to_ec_map = {
+        "Dispersin B": "3.2.1.52",
+        "DNAS1_BOVIN": "3.1.21.1",
+        "Proteinase K": "3.4.21.64",
+    }
+    return enzyme_to_ec_map.get(enzyme_name)
+
 # --- Part 1: Data Retrieval ---
 
 def get_uniprot_data_by_name(protein_name):
@@ -166,21 +193,44 @@ def compare_sequences_to_find_mutations(original_seq, novel_seq):
             mutations.append(f"{orig_aa}{i+1}{novel_aa}")
     return mutations
 
-def generate_novel_sequences_with_zymctrl(original_sequence, maxLength, num_to_generate=3):
-    """Uses the AI4PD/ZymCTRL model to generate multiple novel enzyme sequences."""
+def load_zymctrl_generator():
+    """
+    Loads ZymCTRL for the configured ZYMCTRL_BACKEND. "cpu" and "onnx" use
+    zymctrl_cpu.py (int8 / ONNX Runtime, prompt KV cache, per-sequence EOS).
+    """
+    if ZYMCTRL_BACKEND == "pipeline":
+        return pipeline('text-generation', model=ZYMCTRL_MODEL)
+    from zymctrl_cpu import ZymCTRLGenerator
+    return ZymCTRLGenerator(ZYMCTRL_MODEL, backend=ZYMCTRL_BACKEND)
+
+def generate_novel_sequences_with_zymctrl(original_sequence, maxLength, num_to_generate=3, generator=None, ec_number=None):
+    """
+    Uses the AI4PD/ZymCTRL model to generate multiple novel enzyme sequences.
+    With `ec_number` the model is prompted with the enzyme class, otherwise it
+    generates unconditionally. Pass an already loaded `generator` to reuse it
+    across calls.
+    """
     print(f"Generating {num_to_generate} novel sequence candidates with ZymCTRL...")
     candidate_sequences = []
     try:
-        generator = pipeline('text-generation', model='AI4PD/ZymCTRL')
+        if generator is None:
+            generator = load_zymctrl_generator()
         if maxLength == None:
             max_len = len(original_sequence)
         else:
             max_len = maxLength
-        generated_outputs = generator("<|endoftext|>", max_length=max_len, num_return_sequences=num_to_generate)
+        prompt = f"{ec_number}<sep><start>" if ec_number else "<|endoftext|>"
+        print(f"--> Prompt: {prompt}")
+        # one token per residue, plus one so a sequence can end on its own EOS
+        generated_outputs = generator(prompt, max_new_tokens=max_len + 1, num_return_sequences=num_to_generate)
 
         for output in generated_outputs:
             raw_novel_sequence = output['generated_text']
-            novel_sequence = raw_novel_sequence.replace("<|endoftext|>", "").replace(" ", "").strip()[:max_len]
+            if raw_novel_sequence.startswith(prompt):
+                raw_novel_sequence = raw_novel_sequence[len(prompt):]
+            for token in ZYMCTRL_SPECIAL_TOKENS:
+                raw_novel_sequence = raw_novel_sequence.replace(token, "")
+            novel_sequence = raw_novel_sequence.replace(" ", "").strip()[:max_len]
             candidate_sequences.append(novel_sequence)
 
         print(f"SUCCESS: Generated {len(candidate_sequences)} candidates.")
@@ -210,6 +260,7 @@ def save_files_for_manual_analysis(original_sequence, candidate_sequences, unipr
         f.write(f"{original_sequence}\n")
     print(f"✅ Saved original sequence to: {original_fasta_filename}")
 
+    indexed = []
     for i, candidate_seq in enumerate(candidate_sequences):
         candidate_num = i + 1
         print(f"\n--- Processing Candidate {candidate_num} ---")
@@ -232,6 +283,22 @@ def save_files_for_manual_analysis(original_sequence, candidate_sequences, unipr
             print(f"  - Saved {len(mutations)} mutations to: {mutation_filename}")
         else:
             print("  - No mutations found for this candidate.")
+
+        indexed.append({
+            "name": f"candidate_{candidate_num}",
+            "filename": os.path.basename(fasta_filename),
+            "sequence": clean_seq,
+            "mutations": mutations,
+            "identity": round(sequence_identity(original_sequence, clean_seq), 4),
+        })
+
+    # record them in the results database, which also serves /api/candidates
+    # (sequence hash, mutations vs. the template), so the folder is never re-read
+    run_id = os.environ.get(results_db.RUN_ID_ENV) or results_db.new_run_id()
+    results_db.start_run(run_id, "receptor", ligand=sys.argv[1])
+    results_db.add_candidates(run_id, indexed, template=uniprot_id, ligand=sys.argv[1])
+    results_db.finish_run(run_id)
+    print(f"✅ Recorded {len(indexed)} candidates in {results_db.DB_PATH} (run {run_id})")
 # --- Part 4: turn to js file ---
 def turn_candidates_to_js_files():
   candidate_dict = {}
@@ -273,6 +340,8 @@ def main():
         pass
     else:
         max_length = int(sys.argv[3])
+    # optional EC number to condition ZymCTRL on (defaults to the template enzyme's class)
+    ec_number = sys.argv[4] if len(sys.argv) > 4 and sys.argv[4] else None
 
     print_step("Part 1.1: Finding a Template Enzyme for the Ligand")
     protein_name = find_enzyme_for_ligand(ligand_description)
@@ -290,7 +359,13 @@ def main():
     download_alphafold_pdb(uniprot_id)
 
     print_step("Part 2: Generating Novel Sequence Candidates (ZymCTRL)")
-    candidate_sequences = generate_novel_sequences_with_zymctrl(original_sequence, max_length, num_to_generate= number_of_generate) # Generate more candidates
+    ec_number = ec_number or find_ec_number_for_enzyme(protein_name)
+    candidate_sequences = generate_novel_sequences_with_zymctrl(original_sequence, max_length, num_to_generate= number_of_generate, ec_number=ec_number) # Generate more candidates
+
+    print_step("Part 2.1: Removing Near-Duplicate Candidates (MinHash/LSH)")
+    candidate_sequences, clusters = select_representatives(
+        [clean_sequence(seq) for seq in candidate_sequences])
+    save_cluster_membership(clusters, OUTPUT_CLUSTERS)
 
     print_step("Part 3: Saving Files for Manual Analysis")
     save_files_for_manual_analysis(original_sequence, candidate_sequences, uniprot_id)
@@ -0,0 +1,515 @@
+# results_db.py
+#
+# SQLite database of design and docking results across all campaigns:
+#   runs           one receptor.py run, design pipeline or docking job
+#   candidates     generated sequences, keyed by sequence hash (shared across runs)
+#   run_candidates which run produced which candidate, under which name; also the
+#                  listing behind /api/candidates (candidate_index.py)
+#   mutations      mutations of a candidate against its template
+#   folds          ColabFold models of a candidate
+#   docking_runs   one Vina run (ligand, seed, exhaustiveness, box, best affinity)
+#   candidate_affinities  best affinity of a candidate per docked ligand, for /api/candidates
+#   poses          every mode of a Vina run, with its PDBQT block
+#   pose_fingerprints  contacted residues and active-site re-ranking of a pose (pose_analysis.py)
+# Writers take the write lock up front (BEGIN IMMEDIATE) and the database is
+# in WAL mode, so concurrent workers can record results while the API reads.
+#
+# Command line (also used by dockingFolder/script.sh):
+#   python results_db.py dock <ligand> <receptor> <conf.txt> <result_1.txt> [...] [--structure <receptor.cif> [--json <out>]]
+#     (with --structure the recorded poses are also fingerprinted and re-ranked by
+#      pose_analysis.py against ENDZYME_CATALYTIC_RESIDUES, e.g. "D197 E198")
+#   python results_db.py fold <run_id> <af2_dir>
+#   python results_db.py top <ligand> [limit]
+#   python results_db.py mutation <mutation>
+
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+APP_ROOT = Path(__file__).resolve().parent
+DB_PATH = Path(os.environ.get("ENDZYME_RESULTS_DB", APP_ROOT / "results.sqlite"))
+# set by the caller of script.sh / receptor.py to attach results to a run and candidate
+RUN_ID_ENV = "ENDZYME_RUN_ID"
+SEQ_HASH_ENV = "ENDZYME_SEQ_HASH"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    ligand TEXT,
+    dock_ligand TEXT,
+    params TEXT,
+    state TEXT NOT NULL DEFAULT 'running',
+    started_at TEXT NOT NULL,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS candidates (
+    seq_hash TEXT PRIMARY KEY,
+    sequence TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_candidates (
+    run_id TEXT NOT NULL REFERENCES runs (id),
+    name TEXT NOT NULL,
+    seq_hash TEXT NOT NULL REFERENCES candidates (seq_hash),
+    template TEXT,
+    identity REAL,
+    mutation_count INTEGER,
+    ligand TEXT,
+    filename TEXT,
+    length INTEGER,
+    created_at TEXT,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS mutations (
+    seq_hash TEXT NOT NULL REFERENCES candidates (seq_hash),
+    template TEXT NOT NULL,
+    mutation TEXT NOT NULL,
+    PRIMARY KEY (seq_hash, template, mutation)
+);
+CREATE TABLE IF NOT EXISTS folds (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT,
+    seq_hash TEXT REFERENCES candidates (seq_hash),
+    model_path TEXT NOT NULL,
+    rank INTEGER,
+    mean_plddt REAL,
+    ptm REAL,
+    created_at TEXT NOT NULL,
+    UNIQUE (model_path)
+);
+CREATE TABLE IF NOT EXISTS docking_runs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT,
+    seq_hash TEXT REFERENCES candidates (seq_hash),
+    receptor TEXT NOT NULL,
+    ligand TEXT NOT NULL,
+    seed INTEGER,
+    exhaustiveness INTEGER,
+    box TEXT,
+    num_modes INTEGER NOT NULL,
+    best_affinity REAL,
+    log_path TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS candidate_affinities (
+    seq_hash TEXT NOT NULL REFERENCES candidates (seq_hash),
+    ligand TEXT NOT NULL,             -- the docked ligand (docking_runs.ligand), not the design target
+    affinity REAL NOT NULL,
+    PRIMARY KEY (seq_hash, ligand)
+);
+CREATE TABLE IF NOT EXISTS poses (
+    docking_run_id INTEGER NOT NULL REFERENCES docking_runs (id) ON DELETE CASCADE,
+    mode INTEGER NOT NULL,
+    affinity REAL NOT NULL,
+    rmsd_lb REAL,
+    rmsd_ub REAL,
+    pdbqt TEXT,
+    PRIMARY KEY (docking_run_id, mode)
+);
+CREATE TABLE IF NOT EXISTS pose_fingerprints (
+    docking_run_id INTEGER NOT NULL,
+    mode INTEGER NOT NULL,
+    contacts TEXT NOT NULL,
+    hbonds TEXT NOT NULL,
+    hydrophobic TEXT NOT NULL,
+    catalytic_contacts INTEGER NOT NULL,
+    catalytic_hbonds INTEGER NOT NULL,
+    in_site INTEGER,                  -- NULL: no catalytic residues were known, the site was not checked
+    score REAL,
+    rank INTEGER,
+    PRIMARY KEY (docking_run_id, mode),
+    FOREIGN KEY (docking_run_id, mode) REFERENCES poses (docking_run_id, mode) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_run_candidates_seq ON run_candidates (seq_hash);
+CREATE INDEX IF NOT EXISTS idx_mutations_mutation ON mutations (mutation, seq_hash);
+CREATE INDEX IF NOT EXISTS idx_folds_seq ON folds (seq_hash);
+CREATE INDEX IF NOT EXISTS idx_docking_ligand_affinity ON docking_runs (ligand, best_affinity);
+CREATE INDEX IF NOT EXISTS idx_docking_seq ON docking_runs (seq_hash);
+CREATE INDEX IF NOT EXISTS idx_docking_run ON docking_runs (run_id);
+-- /api/candidates sorts and pages per ligand on these (rowid is the tie-breaker)
+CREATE INDEX IF NOT EXISTS idx_run_candidates_ligand ON run_candidates (ligand);
+CREATE INDEX IF NOT EXISTS idx_run_candidates_mutations ON run_candidates (ligand, mutation_count);
+CREATE INDEX IF NOT EXISTS idx_run_candidates_length ON run_candidates (ligand, length);
+CREATE INDEX IF NOT EXISTS idx_run_candidates_identity ON run_candidates (ligand, identity);
+CREATE INDEX IF NOT EXISTS idx_candidate_affinities ON candidate_affinities (ligand, affinity, seq_hash);
+"""
+# stored in PRAGMA user_version once SCHEMA has been created, so connect() skips it
+SCHEMA_VERSION = 2
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+def sequence_hash(sequence):
+    return hashlib.sha256(sequence.upper().encode()).hexdigest()
+
+def new_run_id():
+    return uuid.uuid4().hex[:12]
+
+def connect(path=None):
+    # autocommit mode: transactions are opened explicitly by _write
+    conn = sqlite3.connect(str(path or DB_PATH), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        conn.executescript(SCHEMA)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+@contextmanager
+def _write(path=None):
+    """
+    One write transaction. BEGIN IMMEDIATE takes the write lock at the start,
+    so two workers never both read and then fail to upgrade to a write
+    (SQLITE_BUSY); the second one waits up to the connect timeout instead.
+    """
+    conn = connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+# --- Runs ---
+
+def start_run(run_id, kind, ligand=None, dock_ligand=None, params=None, path=None):
+    with _write(path) as conn:
+        conn.execute("""
+            INSERT INTO runs (id, kind, ligand, dock_ligand, params, started_at) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO NOTHING
+        """, (run_id, kind, ligand, dock_ligand, json.dumps(params) if params else None, _now()))
+    return run_id
+
+def finish_run(run_id, state="finished", path=None):
+    with _write(path) as conn:
+        conn.execute("UPDATE runs SET state = ?, finished_at = ? WHERE id = ?", (state, _now(), run_id))
+
+def _ensure_run(conn, run_id, kind):
+    conn.execute("INSERT INTO runs (id, kind, started_at) VALUES (?, ?, ?) ON CONFLICT (id) DO NOTHING",
+                 (run_id, kind, _now()))
+
+def candidate_exists(seq_hash, path=None):
+    conn = connect(path)
+    try:
+        return conn.execute("SELECT 1 FROM candidates WHERE seq_hash = ?", (seq_hash,)).fetchone() is not None
+    finally:
+        conn.close()
+
+def _ensure_candidate(conn, sequence):
+    seq_hash = sequence_hash(sequence)
+    conn.execute("""
+        INSERT INTO candidates (seq_hash, sequence, length, created_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT (seq_hash) DO NOTHING
+    """, (seq_hash, sequence.upper(), len(sequence), _now()))
+    return seq_hash
+
+
+# --- Candidates and folds ---
+
+def add_candidates(run_id, candidates, template=None, ligand=None, path=None):
+    """
+    Records the candidates of a run. Each candidate is a dict with name and
+    sequence, and optionally filename, mutations (list) and identity against
+    `template` (e.g. the template UniProt id). `ligand` is the design target
+    they are listed under in /api/candidates (default: the run's ligand).
+    Returns the sequence hashes.
+    """
+    hashes = []
+    with _write(path) as conn:
+        _ensure_run(conn, run_id, "design")
+        if ligand is None:
+            ligand = conn.execute("SELECT ligand FROM runs WHERE id = ?", (run_id,)).fetchone()["ligand"]
+        now = _now()
+        for c in candidates:
+            seq_hash = _ensure_candidate(conn, c["sequence"])
+            mutations = c.get("mutations")
+            conn.execute("""
+                INSERT INTO run_candidates (run_id, name, seq_hash, template, identity, mutation_count,
+                                            ligand, filename, length, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (run_id, name) DO UPDATE SET
+                    seq_hash = excluded.seq_hash, template = excluded.template,
+                    identity = excluded.identity, mutation_count = excluded.mutation_count,
+                    ligand = excluded.ligand, filename = excluded.filename, length = excluded.length
+            """, (run_id, c["name"], seq_hash, template, c.get("identity"),
+                  len(mutations) if mutations is not None else None,
+                  ligand, c.get("filename"), len(c["sequence"]), now))
+            if mutations and template:
+                conn.executemany("INSERT OR IGNORE INTO mutations (seq_hash, template, mutation) VALUES (?, ?, ?)",
+                                 [(seq_hash, template, m) for m in mutations])
+            hashes.append(seq_hash)
+    return hashes
+
+def read_colabfold_scores(model_path):
+    """
+    Mean pLDDT and pTM of a ColabFold model from the scores JSON written next
+    to it (<job>_unrelaxed_rank_001_... -> <job>_scores_rank_001_...).
+    """
+    model_path = Path(model_path)
+    scores = model_path.with_name(model_path.stem.replace("_unrelaxed_", "_scores_")
+                                  .replace("_relaxed_", "_scores_") + ".json")
+    if not scores.exists():
+        return None, None
+    data = json.loads(scores.read_text())
+    plddt = data.get("plddt") or []
+    return (round(sum(plddt) / len(plddt), 2) if plddt else None), data.get("ptm")
+
+def add_fold(run_id, sequence, model_path, rank=None, path=None):
+    mean_plddt, ptm = read_colabfold_scores(model_path)
+    if rank is None:
+        match = re.search(r"rank_(\d+)", Path(model_path).name)
+        rank = int(match.group(1)) if match else None
+    with _write(path) as conn:
+        seq_hash = _ensure_candidate(conn, sequence) if sequence else None
+        conn.execute("""
+            INSERT INTO folds (run_id, seq_hash, model_path, rank, mean_plddt, ptm, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (model_path) DO UPDATE SET
+                mean_plddt = excluded.mean_plddt, ptm = excluded.ptm, created_at = excluded.created_at
+        """, (run_id, seq_hash, str(model_path), rank, mean_plddt, ptm, _now()))
+
+def import_fold_dir(run_id, af2_dir, path=None):
+    """
+    Records every ranked model in a ColabFold job folder (e.g. one started by
+    /api/fold). Sequences come from the id,sequence CSV the job was run on.
+    """
+    af2_dir = Path(af2_dir)
+    sequences = {}
+    for query in af2_dir.glob("*.csv"):
+        with open(query, newline="") as f:
+            sequences.update({row["id"]: row["sequence"] for row in csv.DictReader(f) if "id" in row})
+    count = 0
+    for model in sorted(af2_dir.glob("*_rank_*.pdb")):
+        job_id = re.split(r"_(?:un)?relaxed_", model.name)[0]
+        add_fold(run_id, sequences.get(job_id), model, path=path)
+        count += 1
+    return count
+
+
+# --- Docking ---
+
+VINA_MODE_LINE = re.compile(r"^\s*(\d+)\s+(-?\d+(?:\.\d+)?)\s+(\d+(?:\.\d+)?)\s+(\d+(?:\.\d+)?)\s*$")
+
+def parse_vina_log(text):
+    """Seed and all modes [(mode, affinity, rmsd_lb, rmsd_ub)] from Vina's stdout."""
+    seed_match = re.search(r"random seed:\s*(-?\d+)", text)
+    modes, in_table = [], False
+    for line in text.splitlines():
+        if line.startswith("-----+"):
+            in_table = True
+            continue
+        if in_table:
+            match = VINA_MODE_LINE.match(line)
+            if not match:
+                break
+            mode, affinity, lb, ub = match.groups()
+            modes.append((int(mode), float(affinity), float(lb), float(ub)))
+    return (int(seed_match.group(1)) if seed_match else None), modes
+
+def parse_vina_config(path):
+    config = {}
+    for line in Path(path).read_text().splitlines():
+        if "=" in line:
+            key, value = line.split("=", 1)
+            config[key.strip()] = value.strip()
+    return config
+
+def split_pdbqt_models(text):
+    """PDBQT blocks of a Vina output file, keyed by MODEL number."""
+    models, current, number = {}, [], None
+    for line in text.splitlines():
+        if line.startswith("MODEL"):
+            number, current = int(line.split()[1]), [line]
+        elif line.startswith("ENDMDL") and number is not None:
+            current.append(line)
+            models[number] = "\n".join(current) + "\n"
+            number = None
+        elif number is not None:
+            current.append(line)
+    return models
+
+def add_docking_run(ligand, receptor, modes, seed=None, exhaustiveness=None, box=None, poses_pdbqt=None,
+                    run_id=None, seq_hash=None, log_path=None, path=None):
+    """
+    Records one Vina run and all its modes; returns the docking run id. With
+    a seq_hash, the candidate's best affinity against `ligand` is updated
+    (candidate_affinities), whichever flow docked it.
+    """
+    with _write(path) as conn:
+        if run_id:
+            _ensure_run(conn, run_id, "docking")
+        cursor = conn.execute("""
+            INSERT INTO docking_runs (run_id, seq_hash, receptor, ligand, seed, exhaustiveness, box,
+                                      num_modes, best_affinity, log_path, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (run_id, seq_hash, receptor, ligand, seed, exhaustiveness, json.dumps(box) if box else None,
+              len(modes), min((m[1] for m in modes), default=None), log_path, _now()))
+        docking_run_id = cursor.lastrowid
+        conn.executemany("""
+            INSERT INTO poses (docking_run_id, mode, affinity, rmsd_lb, rmsd_ub, pdbqt) VALUES (?, ?, ?, ?, ?, ?)
+        """, [(docking_run_id, mode, affinity, lb, ub, (poses_pdbqt or {}).get(mode))
+              for mode, affinity, lb, ub in modes])
+        best = min((m[1] for m in modes), default=None)
+        if seq_hash and best is not None:
+            conn.execute("""
+                INSERT INTO candidate_affinities (seq_hash, ligand, affinity) VALUES (?, ?, ?)
+                ON CONFLICT (seq_hash, ligand) DO UPDATE SET affinity = MIN(affinity, excluded.affinity)
+            """, (seq_hash, ligand, best))
+    return docking_run_id
+
+def record_vina_results(ligand, receptor, config_path, log_paths, run_id=None, seq_hash=None, path=None):
+    """
+    Records the Vina runs of one script.sh invocation: results/result_<i>.txt
+    logs, the conf.txt they used and, when kept, results/vina_out_<i>.pdbqt.
+    Returns [(docking run id, pdbqt path or None)].
+    """
+    config = parse_vina_config(config_path) if config_path and Path(config_path).exists() else {}
+    box = {k: float(config[k]) for k in ("center_x", "center_y", "center_z", "size_x", "size_y", "size_z")
+           if k in config} or None
+    exhaustiveness = int(config["exhaustiveness"]) if "exhaustiveness" in config else None
+
+    ids = []
+    for log_path in log_paths:
+        log_path = Path(log_path)
+        seed, modes = parse_vina_log(log_path.read_text(errors="replace"))
+        if not modes:
+            print(f"WARNING: no docking modes in {log_path}, skipped")
+            continue
+        out = log_path.with_name(log_path.name.replace("result_", "vina_out_")).with_suffix(".pdbqt")
+        poses = split_pdbqt_models(out.read_text()) if out.exists() else None
+        docking_run_id = add_docking_run(ligand, receptor, modes, seed=seed, exhaustiveness=exhaustiveness, box=box,
+                                         poses_pdbqt=poses, run_id=run_id, seq_hash=seq_hash,
+                                         log_path=str(log_path.resolve()), path=path)
+        ids.append((docking_run_id, str(out) if out.exists() else None))
+    return ids
+
+def add_pose_fingerprints(rows, path=None):
+    """Stores pose_analysis.rank_poses rows that carry a docking_run_id."""
+    with _write(path) as conn:
+        conn.executemany("""
+            INSERT INTO pose_fingerprints (docking_run_id, mode, contacts, hbonds, hydrophobic,
+                                           catalytic_contacts, catalytic_hbonds, in_site, score, rank)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (docking_run_id, mode) DO UPDATE SET
+                contacts = excluded.contacts, hbonds = excluded.hbonds, hydrophobic = excluded.hydrophobic,
+                catalytic_contacts = excluded.catalytic_contacts, catalytic_hbonds = excluded.catalytic_hbonds,
+                in_site = excluded.in_site, score = excluded.score, rank = excluded.rank
+        """, [(r["docking_run_id"], r["mode"], json.dumps(r["contacts"]), json.dumps(r["hbonds"]),
+               json.dumps(r["hydrophobic"]), r["catalytic_contacts"], r["catalytic_hbonds"],
+               None if r["in_site"] is None else int(r["in_site"]),
+               r["score"], r["rank"]) for r in rows])
+
+
+# --- Queries ---
+
+def top_affinities(ligand, limit=20, in_site=False, path=None):
+    """
+    Best docking runs for a ligand across all campaigns (most negative affinity
+    first). With in_site, only poses that pose_analysis.py placed in the active
+    site count; poses whose site was not checked (in_site NULL) are left out.
+    """
+    conn = connect(path)
+    try:
+        if in_site:
+            rows = conn.execute("""
+                SELECT d.id, d.run_id, d.receptor, d.ligand, d.seed, d.exhaustiveness,
+                       MIN(p.affinity) AS best_affinity, d.seq_hash, c.length, d.created_at
+                FROM docking_runs d
+                JOIN poses p ON p.docking_run_id = d.id
+                JOIN pose_fingerprints f ON f.docking_run_id = p.docking_run_id AND f.mode = p.mode AND f.in_site = 1
+                LEFT JOIN candidates c ON c.seq_hash = d.seq_hash
+                WHERE d.ligand = ?
+                GROUP BY d.id ORDER BY best_affinity ASC LIMIT ?
+            """, (ligand, int(limit))).fetchall()
+            return [dict(row) for row in rows]
+        rows = conn.execute("""
+            SELECT d.id, d.run_id, d.receptor, d.ligand, d.seed, d.exhaustiveness, d.best_affinity,
+                   d.seq_hash, c.length, d.created_at
+            FROM docking_runs d LEFT JOIN candidates c ON c.seq_hash = d.seq_hash
+            WHERE d.ligand = ? AND d.best_affinity IS NOT NULL
+            ORDER BY d.best_affinity ASC LIMIT ?
+        """, (ligand, int(limit))).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+def candidates_with_mutation(mutation, path=None):
+    """Every candidate carrying a mutation (e.g. "A123G"), with the runs that produced it."""
+    conn = connect(path)
+    try:
+        rows = conn.execute("""
+            SELECT m.seq_hash, m.template, c.length, rc.run_id, rc.name, rc.identity, rc.mutation_count
+            FROM mutations m
+            JOIN candidates c ON c.seq_hash = m.seq_hash
+            LEFT JOIN run_candidates rc ON rc.seq_hash = m.seq_hash
+            WHERE m.mutation = ?
+            ORDER BY m.seq_hash, rc.run_id
+        """, (mutation,)).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+def docking_poses(docking_run_id, path=None):
+    conn = connect(path)
+    try:
+        rows = conn.execute("SELECT * FROM poses WHERE docking_run_id = ? ORDER BY mode", (docking_run_id,)).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    args, options = sys.argv[2:], {}
+    while len(args) >= 2 and args[-2] in ("--structure", "--json"):
+        options[args[-2]] = args[-1]
+        args = args[:-2]
+    if command == "dock" and len(args) >= 3:
+        seq_hash = os.environ.get(SEQ_HASH_ENV) or None
+        if seq_hash is None and "--structure" in options:
+            import pose_analysis
+            seq_hash = pose_analysis.candidate_seq_hash(options["--structure"])
+        ids = record_vina_results(args[0], args[1], args[2], args[3:],
+                                  run_id=os.environ.get(RUN_ID_ENV) or None, seq_hash=seq_hash)
+        print(f"✅ Recorded {len(ids)} docking runs in {DB_PATH}")
+        if "--structure" in options:
+            import pose_analysis
+            catalytic = os.environ.get(pose_analysis.CATALYTIC_ENV, "").split() or None
+            ranking = pose_analysis.analyze_docking_runs(options["--structure"], ids, catalytic)
+            if "--json" in options:
+                pose_analysis.write_ranking(options["--json"], ranking, catalytic)
+            rejected = sum(1 for row in ranking if row["in_site"] is False)
+            print(f"✅ Fingerprinted {len(ranking)} poses, {rejected} outside the active site")
+    elif command == "fold" and len(sys.argv) == 4:
+        print(f"✅ Recorded {import_fold_dir(sys.argv[2], sys.argv[3])} folds in {DB_PATH}")
+    elif command == "top" and len(sys.argv) >= 3:
+        for row in top_affinities(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 20):
+            print(f"{row['best_affinity']:8.2f}  {row['receptor']}  run={row['run_id']}  seed={row['seed']}")
+    elif command == "mutation" and len(sys.argv) == 3:
+        for row in candidates_with_mutation(sys.argv[2]):
+            print(f"{row['seq_hash'][:12]}  {row['template']}  run={row['run_id']}  {row['name']}")
+    else:
+        print("usage: python results_db.py dock <ligand> <receptor> <conf.txt> <result_1.txt> [...] "
+              "[--structure <receptor.cif> [--json <out>]]\n"
+              "       python results_db.py fold <run_id> <af2_dir>\n"
+              "       python results_db.py top <ligand> [limit]\n"
+              "       python results_db.py mutation <mutation>")
+        sys.exit(1)
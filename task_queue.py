@@ -0,0 +1,215 @@
+# task_queue.py
+#
+# File-lease task queue on shared storage, so fold and dock commands can run on
+# worker hosts (worker.py) while the API host only enqueues. Enabled by
+# pointing ENDZYME_QUEUE_DIR at a directory every host can see:
+#   pending/<task>.json   waiting to be claimed
+#   running/<task>.json   claimed; the file is the lease and its mtime the heartbeat
+#   done/<task>.json      finished, with the result
+#   failed/<task>.json    out of attempts, with the last error
+# Every state change is an atomic rename, so exactly one worker wins a claim.
+# A running task whose heartbeat is older than ENDZYME_LEASE_SECONDS (the
+# worker died or lost the share) is put back in pending/ by the next worker
+# that looks, until it has used up its attempts.
+#
+# A task is a command: {"cmd": [...], "cwd": ..., "log": ..., "env": {...}}.
+# Its output stays in the shared run directory (cwd).
+
+import json
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+QUEUE_DIR_ENV = "ENDZYME_QUEUE_DIR"
+LEASE_SECONDS = float(os.environ.get("ENDZYME_LEASE_SECONDS", "300"))
+HEARTBEAT_SECONDS = float(os.environ.get("ENDZYME_HEARTBEAT_SECONDS", str(LEASE_SECONDS / 10)))
+POLL_SECONDS = float(os.environ.get("ENDZYME_QUEUE_POLL_SECONDS", "2"))
+MAX_ATTEMPTS = 3
+STATES = ("pending", "running", "done", "failed")
+
+
+class TaskFailed(RuntimeError):
+    pass
+
+
+def queue_enabled():
+    return bool(os.environ.get(QUEUE_DIR_ENV))
+
+def queue_dir():
+    root = Path(os.environ[QUEUE_DIR_ENV])
+    for state in STATES + ("tmp",):
+        (root / state).mkdir(parents=True, exist_ok=True)
+    return root
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write(root, path, task):
+    """Writes through tmp/ and renames, so readers never see a half-written file."""
+    tmp = root / "tmp" / f"{path.name}.{uuid.uuid4().hex[:8]}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(task, f, indent=2)
+    os.replace(tmp, path)
+
+def _kind_of(name):
+    # <time_ns>-<kind>-<hex>.json
+    return name.split("-")[1]
+
+
+# --- API host ---
+
+def enqueue(kind, payload, max_attempts=MAX_ATTEMPTS):
+    """Adds a task and returns its id. Ids sort by creation time (FIFO)."""
+    root = queue_dir()
+    task_id = f"{time.time_ns()}-{kind}-{uuid.uuid4().hex[:8]}"
+    _write(root, root / "pending" / f"{task_id}.json", {
+        "id": task_id,
+        "kind": kind,
+        "payload": payload,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "created_at": _now(),
+        "errors": [],
+    })
+    return task_id
+
+def status(task_id):
+    root = queue_dir()
+    for state in STATES:
+        path = root / state / f"{task_id}.json"
+        try:
+            task = _read(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue   # moved to another state while we looked
+        task["state"] = state
+        if state == "running":
+            task["heartbeat_age"] = round(time.time() - path.stat().st_mtime, 1)
+        return task
+    return None
+
+def wait(task_id, poll=POLL_SECONDS, timeout=None):
+    """Blocks until the task is done (returns it) or failed (raises TaskFailed)."""
+    root = queue_dir()
+    deadline = time.time() + timeout if timeout else None
+    while True:
+        if (root / "done" / f"{task_id}.json").exists():
+            return status(task_id)
+        if (root / "failed" / f"{task_id}.json").exists():
+            task = status(task_id)
+            raise TaskFailed(f"task {task_id} failed after {task['attempts']} attempts: "
+                             f"{task['errors'][-1] if task['errors'] else 'unknown error'}")
+        if deadline and time.time() > deadline:
+            raise TimeoutError(f"task {task_id} did not finish in {timeout}s")
+        time.sleep(poll)
+
+def run(kind, payload, max_attempts=MAX_ATTEMPTS):
+    """Enqueues a task and waits for a worker to finish it."""
+    return wait(enqueue(kind, payload, max_attempts))
+
+
+# --- Workers ---
+
+def claim(kinds=None, worker=None):
+    """
+    Claims the oldest pending task (of `kinds`, if given) by renaming it into
+    running/. Returns the task, or None when there is nothing to do.
+    """
+    root = queue_dir()
+    worker = worker or worker_id()
+    for path in sorted((root / "pending").glob("*.json")):
+        if kinds and _kind_of(path.name) not in kinds:
+            continue
+        lease = root / "running" / path.name
+        try:
+            os.utime(path)          # fresh heartbeat before it becomes a lease
+            os.rename(path, lease)
+        except FileNotFoundError:
+            continue                # another worker was faster
+        task = _read(lease)
+        if (root / "done" / path.name).exists():
+            # a retry of a task that finished after its lease had expired
+            lease.unlink(missing_ok=True)
+            continue
+        if task.get("worker"):
+            # the previous owner stopped heartbeating and the lease was reaped
+            task["errors"] = task.get("errors", []) + [f"{task['worker']}: lease expired"]
+        task["attempts"] += 1
+        task["worker"] = worker
+        task["claimed_at"] = _now()
+        _write(root, lease, task)
+        return task
+    return None
+
+def heartbeat(task):
+    """Renews the lease. Returns False if it was lost (expired and re-queued or claimed by another worker)."""
+    lease = queue_dir() / "running" / f"{task['id']}.json"
+    try:
+        if _read(lease).get("worker") != task["worker"]:
+            return False
+        os.utime(lease)
+        return True
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+
+def complete(task, result=None):
+    root = queue_dir()
+    task = dict(task, result=result or {}, finished_at=_now())
+    _write(root, root / "done" / f"{task['id']}.json", task)
+    if heartbeat(task):
+        (root / "running" / f"{task['id']}.json").unlink(missing_ok=True)
+
+def fail(task, error):
+    """Records the error and re-queues the task, or moves it to failed/ when it is out of attempts."""
+    root = queue_dir()
+    lease = root / "running" / f"{task['id']}.json"
+    if not heartbeat(task):
+        return
+    task = dict(task, errors=task.get("errors", []) + [f"{task['worker']}: {error}"])
+    if task["attempts"] >= task["max_attempts"]:
+        _write(root, root / "failed" / lease.name, dict(task, finished_at=_now()))
+        lease.unlink(missing_ok=True)
+    else:
+        _write(root, lease, dict(task, worker=None))
+        os.rename(lease, root / "pending" / lease.name)
+
+def release(task):
+    """Gives a task back without counting the attempt (worker shutting down)."""
+    root = queue_dir()
+    lease = root / "running" / f"{task['id']}.json"
+    if heartbeat(task):
+        _write(root, lease, dict(task, attempts=task["attempts"] - 1, worker=None))
+        os.rename(lease, root / "pending" / lease.name)
+
+def reap_expired(lease_seconds=LEASE_SECONDS):
+    """Re-queues running tasks whose heartbeat is older than `lease_seconds`. Returns their ids."""
+    root = queue_dir()
+    expired = []
+    now = time.time()
+    for lease in (root / "running").glob("*.json"):
+        try:
+            if now - lease.stat().st_mtime < lease_seconds:
+                continue
+            task = _read(lease)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        out_of_attempts = task["attempts"] >= task["max_attempts"]
+        target = root / ("failed" if out_of_attempts else "pending") / lease.name
+        try:
+            os.rename(lease, target)
+        except FileNotFoundError:
+            continue                # finished or reaped by someone else meanwhile
+        if out_of_attempts:
+            task["errors"] = task.get("errors", []) + [f"{task.get('worker')}: lease expired"]
+            _write(root, target, dict(task, finished_at=_now()))
+        expired.append(task["id"])
+    return expired
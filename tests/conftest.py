@@ -0,0 +1,8 @@
+# conftest.py
+#
+# The modules under test are flat scripts in the repository root.
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,103 @@
+# test_candidate_index.py
+#
+# Keyset pagination of /api/candidates (candidate_index.query_candidates)
+# against a brute-force ordering. Run with: python -m pytest tests
+
+import random
+
+import pytest
+
+import candidate_index
+import results_db
+
+ROWS = 237
+PAGE = 17
+DOCK_LIGAND = "GlcNAc"
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("candidates") / "results.sqlite"
+    rng = random.Random(7)
+    results_db.start_run("run-1", "test", ligand="PGA", path=path)
+    candidates = []
+    for n in range(ROWS):
+        sequence = "".join(rng.choice("ACDEFGHIKLMNPQRSTVWY") for _ in range(rng.randint(20, 30)))
+        candidates.append({
+            "name": f"candidate_{n + 1}",
+            "sequence": sequence,
+            # few distinct values, so many ties are broken by id; some rows have none
+            "mutations": None if n % 5 == 0 else ["A1G"] * rng.randint(0, 3),
+            "identity": None if n % 4 == 0 else rng.choice([0.5, 0.75, 0.9]),
+        })
+    hashes = results_db.add_candidates("run-1", candidates, template="Q6GYA5", path=path)
+    # a candidate of another design ligand must not show up
+    results_db.start_run("run-2", "test", ligand="OTHER", path=path)
+    results_db.add_candidates("run-2", [{"name": "candidate_1", "sequence": "MKV"}], path=path)
+    # about two thirds are docked against DOCK_LIGAND; other ligands must not leak into affinity
+    for n, seq_hash in enumerate(hashes):
+        if n % 3:
+            affinity = rng.choice([-9.0, -8.5, -8.0])
+            results_db.add_docking_run(DOCK_LIGAND, f"candidate_{n + 1}", [(1, affinity, 0.0, 0.0)],
+                                       seq_hash=seq_hash, path=path)
+        results_db.add_docking_run("OtherLigand", f"candidate_{n + 1}", [(1, -12.0, 0.0, 0.0)],
+                                   seq_hash=seq_hash, path=path)
+    return path
+
+def _expected(db, sort, order):
+    rows = candidate_index.query_candidates("PGA", sort="id", fields=["id", sort], limit=candidate_index.MAX_LIMIT,
+                                            dock_ligand=DOCK_LIGAND, path=db)["items"]
+    assert len(rows) == ROWS
+    present = sorted((r for r in rows if r[sort] is not None), key=lambda r: (r[sort], r["id"]),
+                     reverse=order == "desc")
+    missing = sorted((r["id"] for r in rows if r[sort] is None))
+    return [r["id"] for r in present] + missing
+
+def _pages(db, sort, order):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page = candidate_index.query_candidates("PGA", sort=sort, order=order, fields=["id"], limit=PAGE,
+                                                cursor=cursor, dock_ligand=DOCK_LIGAND, path=db)
+        assert page["total"] == ROWS
+        assert len(page["items"]) <= PAGE
+        ids += [item["id"] for item in page["items"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("sort", candidate_index.SORT_FIELDS)
+def test_pages_match_brute_force(db, sort, order):
+    ids, pages = _pages(db, sort, order)
+
+    assert ids == _expected(db, sort, order)
+    assert pages == -(-ROWS // PAGE)
+
+def test_both_ranges_are_exercised(db):
+    rows = candidate_index.query_candidates("PGA", fields=["affinity", "identity", "mutation_count"],
+                                            limit=candidate_index.MAX_LIMIT, dock_ligand=DOCK_LIGAND, path=db)["items"]
+    for field in ("affinity", "identity", "mutation_count"):
+        values = [row[field] for row in rows]
+        assert None in values and any(v is not None for v in values)
+    assert {row["affinity"] for row in rows} <= {None, -9.0, -8.5, -8.0}
+
+def test_filters_apply_to_every_page(db):
+    ids, cursor = [], None
+    while True:
+        page = candidate_index.query_candidates("PGA", filters={"max_affinity": -8.5, "min_identity": 0.75},
+                                                sort="affinity", order="desc", fields=["id", "affinity", "identity"],
+                                                limit=PAGE, cursor=cursor, dock_ligand=DOCK_LIGAND, path=db)
+        assert all(item["affinity"] <= -8.5 and item["identity"] >= 0.75 for item in page["items"])
+        ids += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(ids) == len(set(ids)) == page["total"]
+
+def test_affinity_needs_dock_ligand(db):
+    with pytest.raises(ValueError, match="dock_ligand"):
+        candidate_index.query_candidates("PGA", sort="affinity", path=db)
+    with pytest.raises(ValueError, match="dock_ligand"):
+        candidate_index.query_candidates("PGA", filters={"min_affinity": -9}, path=db)
@@ -0,0 +1,127 @@
+# test_task_queue.py
+#
+# Claim, lease expiry, retry and release ordering of the file-lease queue
+# (task_queue.py). Run with: python -m pytest tests
+
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import task_queue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setenv(task_queue.QUEUE_DIR_ENV, str(tmp_path))
+    return tmp_path
+
+def _expire(root, task_id):
+    lease = root / "running" / f"{task_id}.json"
+    old = time.time() - 3600
+    os.utime(lease, (old, old))
+
+def _drain(root):
+    # one worker process: claims and completes tasks until the queue is empty
+    os.environ[task_queue.QUEUE_DIR_ENV] = str(root)
+    claimed = []
+    while True:
+        task = task_queue.claim()
+        if task is None:
+            return claimed
+        claimed.append(task["id"])
+        task_queue.complete(task)
+
+
+def test_concurrent_claims_run_each_task_once(queue):
+    ids = {task_queue.enqueue("fold", {"n": n}) for n in range(200)}
+
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        claimed = [task_id for worker in pool.map(_drain, [queue] * 4) for task_id in worker]
+
+    assert sorted(claimed) == sorted(ids)
+    assert {p.stem for p in (queue / "done").glob("*.json")} == ids
+    assert not list((queue / "pending").glob("*.json"))
+    assert not list((queue / "running").glob("*.json"))
+
+def test_claim_is_fifo_and_filters_kinds(queue):
+    first = task_queue.enqueue("fold", {})
+    dock = task_queue.enqueue("dock", {})
+    second = task_queue.enqueue("fold", {})
+
+    assert task_queue.claim(kinds=["dock"])["id"] == dock
+    assert task_queue.claim()["id"] == first
+    assert task_queue.claim()["id"] == second
+    assert task_queue.claim() is None
+
+def test_expired_lease_is_reclaimed_with_an_error(queue):
+    task_id = task_queue.enqueue("dock", {})
+    stale = task_queue.claim(worker="host-a:1")
+    _expire(queue, task_id)
+
+    assert task_queue.reap_expired(lease_seconds=60) == [task_id]
+    retry = task_queue.claim(worker="host-b:2")
+
+    assert retry["attempts"] == 2
+    assert retry["errors"] == ["host-a:1: lease expired"]
+    # the stale owner has lost the lease and cannot finish or fail the retry
+    assert not task_queue.heartbeat(stale)
+    task_queue.fail(stale, "late error")
+    assert task_queue.status(task_id)["state"] == "running"
+    assert task_queue.status(task_id)["worker"] == "host-b:2"
+
+def test_fresh_lease_is_not_reaped(queue):
+    task_queue.enqueue("dock", {})
+    task = task_queue.claim()
+
+    assert task_queue.reap_expired(lease_seconds=60) == []
+    assert task_queue.heartbeat(task)
+
+def test_expired_lease_out_of_attempts_fails(queue):
+    task_id = task_queue.enqueue("dock", {}, max_attempts=1)
+    task_queue.claim(worker="host-a:1")
+    _expire(queue, task_id)
+
+    assert task_queue.reap_expired(lease_seconds=60) == [task_id]
+    status = task_queue.status(task_id)
+    assert status["state"] == "failed"
+    assert status["errors"] == ["host-a:1: lease expired"]
+    assert task_queue.claim() is None
+
+def test_fail_retries_until_max_attempts(queue):
+    task_id = task_queue.enqueue("fold", {}, max_attempts=3)
+
+    for attempt in range(1, 4):
+        task = task_queue.claim(worker=f"w:{attempt}")
+        assert task["attempts"] == attempt
+        task_queue.fail(task, f"error {attempt}")
+        assert task_queue.status(task_id)["state"] == ("failed" if attempt == 3 else "pending")
+
+    status = task_queue.status(task_id)
+    assert status["errors"] == ["w:1: error 1", "w:2: error 2", "w:3: error 3"]
+    assert task_queue.claim() is None
+    with pytest.raises(task_queue.TaskFailed, match="after 3 attempts: w:3: error 3"):
+        task_queue.wait(task_id, poll=0.01)
+
+def test_release_does_not_count_the_attempt(queue):
+    task_id = task_queue.enqueue("fold", {}, max_attempts=1)
+    task_queue.release(task_queue.claim(worker="w:1"))
+
+    assert task_queue.status(task_id)["state"] == "pending"
+    task = task_queue.claim(worker="w:2")
+    assert task["attempts"] == 1
+    assert task["errors"] == []
+
+def test_late_completion_drops_the_retry(queue):
+    task_id = task_queue.enqueue("dock", {})
+    stale = task_queue.claim(worker="host-a:1")
+    _expire(queue, task_id)
+    task_queue.reap_expired(lease_seconds=60)
+
+    # the first worker finishes after its lease was reaped but before the retry is claimed
+    task_queue.complete(stale, {"ok": True})
+
+    assert task_queue.claim() is None
+    assert task_queue.status(task_id)["state"] == "done"
+    assert task_queue.wait(task_id, poll=0.01)["result"] == {"ok": True}
@@ -0,0 +1,107 @@
+# worker.py
+#
+# Runs fold and dock tasks from the shared task queue (see task_queue.py).
+# Start one or more on any host that mounts ENDZYME_QUEUE_DIR and the run
+# directories at the same paths as the API host:
+#   ENDZYME_QUEUE_DIR=/shared/endzyme_queue python worker.py --kinds fold
+#   ENDZYME_QUEUE_DIR=/shared/endzyme_queue python worker.py --kinds dock
+# Each worker runs one task at a time; start more workers for more throughput.
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import task_queue
+
+APP_ROOT = Path(__file__).resolve().parent
+_stopping = False
+
+
+def _stop(signum, frame):
+    global _stopping
+    _stopping = True
+
+
+def run_task(task):
+    """
+    Runs the task's command with its output in the shared run directory,
+    renewing the lease while it runs. Returns (returncode, lease_lost).
+    """
+    payload = task["payload"]
+    env = dict(os.environ)
+    env.update(payload.get("env") or {})
+    env["ENDZYME_ROOT"] = str(APP_ROOT)     # where script.sh finds this checkout's scripts
+
+    Path(payload["cwd"]).mkdir(parents=True, exist_ok=True)
+    log_path = payload.get("log") or str(Path(payload["cwd"]) / f"{task['id']}.log")
+    with open(log_path, "a") as log:
+        log.write(f"[worker {task['worker']}] attempt {task['attempts']}: {' '.join(payload['cmd'])}\n")
+        log.flush()
+        proc = subprocess.Popen(payload["cmd"], cwd=payload["cwd"], stdout=log, stderr=subprocess.STDOUT,
+                                env=env, start_new_session=True)
+        while True:
+            try:
+                return proc.wait(timeout=task_queue.HEARTBEAT_SECONDS), False
+            except subprocess.TimeoutExpired:
+                pass
+            if _stopping or not task_queue.heartbeat(task):
+                proc.terminate()
+                try:
+                    proc.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                return None, not _stopping
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ENDzyme fold/dock worker")
+    parser.add_argument("--kinds", nargs="+", default=["fold", "dock"], help="task kinds to run")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    if not task_queue.queue_enabled():
+        print(f"ERROR: set {task_queue.QUEUE_DIR_ENV} to the shared queue directory")
+        sys.exit(1)
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    worker = task_queue.worker_id()
+    print(f"--> Worker {worker} waiting for {', '.join(args.kinds)} tasks in {task_queue.queue_dir()}")
+    while not _stopping:
+        for task_id in task_queue.reap_expired():
+            print(f"WARNING: lease of {task_id} expired, re-queued")
+        task = task_queue.claim(args.kinds, worker)
+        if task is None:
+            if args.once:
+                break
+            time.sleep(task_queue.POLL_SECONDS)
+            continue
+
+        print(f"--> {task['id']} (attempt {task['attempts']}/{task['max_attempts']})")
+        start = time.time()
+        try:
+            returncode, lost = run_task(task)
+        except Exception as e:
+            print(f"ERROR: {task['id']}: {e}")
+            task_queue.fail(task, str(e))
+            continue
+        if _stopping and returncode is None:
+            task_queue.release(task)
+            print(f"--> {task['id']} released (worker stopping)")
+        elif lost:
+            print(f"WARNING: lost the lease of {task['id']}, stopped it")
+        elif returncode != 0:
+            print(f"ERROR: {task['id']} exited with code {returncode}")
+            task_queue.fail(task, f"exit code {returncode}")
+        else:
+            task_queue.complete(task, {"seconds": round(time.time() - start, 1)})
+            print(f"SUCCESS: {task['id']} finished in {time.time() - start:.1f}s")
+    print(f"--> Worker {worker} stopped")
+
+
+if __name__ == "__main__":
+    main()
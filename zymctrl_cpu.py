@@ -0,0 +1,144 @@
+# zymctrl_cpu.py
+#
+# CPU inference for ZymCTRL, selected with ZYMCTRL_BACKEND=cpu or onnx
+# (see receptor.load_zymctrl_generator).
+#   - cpu:  PyTorch with int8 dynamic quantization of all linear layers
+#   - onnx: ONNX Runtime via optimum (optional dependency)
+# The prompt (EC number) is encoded once and its KV cache is reused for every
+# sample, and each sequence stops at its own EOS instead of running to
+# max_length. The object is called like the transformers text-generation
+# pipeline, so receptor.py can use either one.
+
+import os
+import time
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+# generation settings recommended on the ZymCTRL model card
+TOP_K = 9
+REPETITION_PENALTY = 1.2
+EOS_TOKEN_ID = 1
+PAD_TOKEN_ID = 0
+BATCH_SIZE = int(os.environ.get("ZYMCTRL_BATCH_SIZE", "8"))
+
+
+def quantize_int8(model):
+    """
+    Int8 dynamic quantization. GPT-2 style models use transformers' Conv1D for
+    their projections, which quantize_dynamic does not touch, so those are
+    converted to nn.Linear first.
+    """
+    from transformers.pytorch_utils import Conv1D
+
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if isinstance(child, Conv1D):
+                # Conv1D computes x @ W + b with W of shape (in, out)
+                linear = torch.nn.Linear(child.weight.shape[0], child.weight.shape[1])
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data.clone()
+                setattr(module, child_name, linear)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _legacy_cache(past):
+    """Returns past_key_values as a tuple of (key, value) tuples, whatever transformers version produced it."""
+    return past.to_legacy_cache() if hasattr(past, "to_legacy_cache") else past
+
+def _select_rows(past, rows):
+    return tuple(tuple(t.index_select(0, rows) for t in layer) for layer in past)
+
+def _expand_rows(past, n):
+    return tuple(tuple(t.expand(n, *t.shape[1:]).contiguous() for t in layer) for layer in past)
+
+
+class ZymCTRLGenerator:
+    def __init__(self, model_name, backend="cpu", quantize=True, threads=None):
+        threads = threads or int(os.environ.get("ZYMCTRL_THREADS", "0")) or os.cpu_count()
+        torch.set_num_threads(threads)
+        self.backend = backend
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        start = time.perf_counter()
+        if backend == "onnx":
+            try:
+                from optimum.onnxruntime import ORTModelForCausalLM
+            except ImportError:
+                raise ImportError("ZYMCTRL_BACKEND=onnx needs optimum with ONNX Runtime: "
+                                  "pip install optimum[onnxruntime]")
+            self.model = ORTModelForCausalLM.from_pretrained(model_name, export=True, use_cache=True)
+        elif backend == "cpu":
+            model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float32)
+            model.eval()
+            self.model = quantize_int8(model) if quantize else model
+        else:
+            raise ValueError(f"Unknown ZymCTRL backend: {backend}")
+        print(f"--> Loaded ZymCTRL ({backend}{', int8' if backend == 'cpu' and quantize else ''}, "
+              f"{threads} threads) in {time.perf_counter() - start:.1f}s")
+
+        self._prompt_cache = {}
+
+    @torch.inference_mode()
+    def _prompt_state(self, prompt):
+        """Encodes the prompt once; returns (prompt ids, KV cache, next-token logits)."""
+        if prompt not in self._prompt_cache:
+            ids = self.tokenizer.encode(prompt, return_tensors="pt")
+            out = self.model(input_ids=ids, attention_mask=torch.ones_like(ids), use_cache=True)
+            self._prompt_cache[prompt] = (ids, _legacy_cache(out.past_key_values), out.logits[:, -1, :])
+        return self._prompt_cache[prompt]
+
+    @torch.inference_mode()
+    def _sample_batch(self, prompt, n, max_new_tokens, top_k, repetition_penalty, eos_token_id):
+        ids, past, logits = self._prompt_state(prompt)
+        past = _expand_rows(past, n)
+        logits = logits.expand(n, -1)
+        context = ids.expand(n, -1)
+        prompt_len = ids.shape[1]
+
+        tokens = [[] for _ in range(n)]
+        active = torch.arange(n)           # original row of each sequence still generating
+        for step in range(max_new_tokens):
+            # repetition penalty over prompt + generated tokens (same rule as transformers)
+            scores = logits.gather(1, context)
+            scores = torch.where(scores < 0, scores * repetition_penalty, scores / repetition_penalty)
+            logits = logits.scatter(1, context, scores)
+
+            top_values, top_index = logits.topk(top_k, dim=-1)
+            choice = torch.multinomial(torch.softmax(top_values, dim=-1), 1)
+            next_tokens = top_index.gather(1, choice)
+
+            for row, token in zip(active.tolist(), next_tokens[:, 0].tolist()):
+                tokens[row].append(token)
+
+            # drop finished sequences from the batch so they stop costing compute
+            keep = (next_tokens[:, 0] != eos_token_id).nonzero()[:, 0]
+            if keep.numel() == 0:
+                break
+            if keep.numel() < active.numel():
+                active = active.index_select(0, keep)
+                past = _select_rows(past, keep)
+                next_tokens = next_tokens.index_select(0, keep)
+                context = context.index_select(0, keep)
+            context = torch.cat([context, next_tokens], dim=1)
+
+            attention = torch.ones((active.numel(), prompt_len + step + 1), dtype=torch.long)
+            out = self.model(input_ids=next_tokens, past_key_values=past, attention_mask=attention, use_cache=True)
+            past = _legacy_cache(out.past_key_values)
+            logits = out.logits[:, -1, :]
+        return tokens
+
+    def __call__(self, prompt, max_new_tokens=None, max_length=None, num_return_sequences=1,
+                 top_k=TOP_K, repetition_penalty=REPETITION_PENALTY, eos_token_id=EOS_TOKEN_ID, **kwargs):
+        if max_new_tokens is None:
+            max_new_tokens = (max_length or 1024) - len(self.tokenizer.encode(prompt))
+
+        start = time.perf_counter()
+        outputs, total_tokens = [], 0
+        for begin in range(0, num_return_sequences, BATCH_SIZE):
+            n = min(BATCH_SIZE, num_return_sequences - begin)
+            for tokens in self._sample_batch(prompt, n, max_new_tokens, top_k, repetition_penalty, eos_token_id):
+                total_tokens += len(tokens)
+                tokens = [t for t in tokens if t not in (eos_token_id, PAD_TOKEN_ID)]
+                outputs.append({"generated_text": prompt + self.tokenizer.decode(tokens)})
+        seconds = time.perf_counter() - start
+        print(f"--> Sampled {total_tokens} tokens in {seconds:.1f}s ({total_tokens / max(seconds, 1e-9):.1f} tokens/s)")
+        return outputs